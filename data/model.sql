@@ -14,7 +14,8 @@ CREATE TABLE IF NOT EXISTS `giveaways` (
     `max_entries` INTEGER DEFAULT NULL,
     `winners_count` INTEGER NOT NULL,
     `ends_at` DATETIME NOT NULL,
-    `ended` BOOLEAN NOT NULL DEFAULT false
+    `ended` BOOLEAN NOT NULL DEFAULT false,
+    `close_when_full` BOOLEAN NOT NULL DEFAULT false
 );
 CREATE INDEX IF NOT EXISTS idx_giveaways ON `giveaways` (`id`);
 
@@ -26,4 +27,66 @@ CREATE TABLE IF NOT EXISTS `giveaway_entries` (
     PRIMARY KEY (`giveaway_id`, `user_id`)
 );
 CREATE INDEX IF NOT EXISTS idx_giveaway_entries ON `giveaway_entries` (`giveaway_id`);
-CREATE UNIQUE INDEX IF NOT EXISTS idx_giveaway_entries_unique ON `giveaway_entries` (`giveaway_id`, `user_id`);
\ No newline at end of file
+CREATE UNIQUE INDEX IF NOT EXISTS idx_giveaway_entries_unique ON `giveaway_entries` (`giveaway_id`, `user_id`);
+CREATE INDEX IF NOT EXISTS idx_giveaway_entries_winner ON `giveaway_entries` (`giveaway_id`, `winner`);
+
+CREATE TABLE IF NOT EXISTS `giveaway_outbox` (
+    `id` INTEGER PRIMARY KEY AUTOINCREMENT,
+    `dedup_key` VARCHAR(150) NOT NULL UNIQUE,
+    `giveaway_id` VARCHAR(50) NOT NULL,
+    `action` VARCHAR(20) NOT NULL,
+    `payload` TEXT NOT NULL,
+    `attempts` INTEGER NOT NULL DEFAULT 0,
+    `next_attempt_at` DATETIME NOT NULL,
+    `done_at` DATETIME DEFAULT NULL,
+    `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS `giveaway_compactions` (
+    `giveaway_id` VARCHAR(50) PRIMARY KEY,
+    `entries_count` INTEGER NOT NULL,
+    `compacted_at` DATETIME DEFAULT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_giveaways_ended ON `giveaways` (`ended`, `ends_at`);
+CREATE INDEX IF NOT EXISTS idx_giveaways_guild ON `giveaways` (`guild_id`);
+
+CREATE TABLE IF NOT EXISTS `giveaway_messages` (
+    `giveaway_id` VARCHAR(50) NOT NULL,
+    `channel_id` BIGINT NOT NULL,
+    `message_id` BIGINT PRIMARY KEY
+);
+CREATE INDEX IF NOT EXISTS idx_giveaway_messages ON `giveaway_messages` (`giveaway_id`);
+
+CREATE TABLE IF NOT EXISTS `giveaway_guild_stats` (
+    `guild_id` BIGINT PRIMARY KEY,
+    `giveaways_count` INTEGER NOT NULL DEFAULT 0,
+    `ended_count` INTEGER NOT NULL DEFAULT 0,
+    `entries_count` INTEGER NOT NULL DEFAULT 0,
+    `participants_count` INTEGER NOT NULL DEFAULT 0,
+    `winners_count` INTEGER NOT NULL DEFAULT 0,
+    `fill_rate_sum` REAL NOT NULL DEFAULT 0,
+    `fill_rate_count` INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS `giveaway_user_stats` (
+    `guild_id` BIGINT NOT NULL,
+    `user_id` BIGINT NOT NULL,
+    `entries_count` INTEGER NOT NULL DEFAULT 0,
+    `wins_count` INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (`guild_id`, `user_id`)
+);
+CREATE INDEX IF NOT EXISTS idx_giveaway_user_stats_entries ON `giveaway_user_stats` (`guild_id`, `entries_count`);
+
+CREATE TABLE IF NOT EXISTS `giveaway_draws` (
+    `id` INTEGER PRIMARY KEY AUTOINCREMENT,
+    `giveaway_id` VARCHAR(50) NOT NULL,
+    `kind` VARCHAR(10) NOT NULL,
+    `algorithm` VARCHAR(30) NOT NULL,
+    `seed` VARCHAR(64) NOT NULL,
+    `winners_count` INTEGER NOT NULL,
+    `snapshot_hash` CHAR(64) NOT NULL,
+    `snapshot` BLOB NOT NULL,
+    `winners` TEXT NOT NULL,
+    `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_giveaway_draws ON `giveaway_draws` (`giveaway_id`);
@@ -0,0 +1,31 @@
+from typing import Optional
+
+# Retention of ended giveaways, counted in days after their end date.
+# Compacting a giveaway only keeps its winners and its total number of entries,
+# purging it removes it entirely from the database. Use None to disable a step.
+# Both steps are disabled by default, so that no giveaway is deleted without being asked to.
+# Example: 30 days before compacting and 365 days before purging.
+COMPACT_ENDED_GIVEAWAYS_AFTER_DAYS: Optional[int] = None
+PURGE_ENDED_GIVEAWAYS_AFTER_DAYS: Optional[int] = None
+# Whether to save the full entries list of compacted giveaways in `data/archives`
+ARCHIVE_COMPACTED_ENTRIES: bool = True
+# Maximum number of giveaways compacted or purged per run of the retention task
+RETENTION_GIVEAWAYS_PER_RUN: int = 20
+# Number of entries deleted at once, and delay in seconds between two deletions
+RETENTION_BATCH_SIZE: int = 500
+RETENTION_BATCH_DELAY: float = 0.5
+
+# Limits applied to every guild, to keep the cost of a single guild bounded. Use None for no limit.
+# - max_active_giveaways: number of giveaways which are not ended yet
+# - max_entries: number of participants of a giveaway
+# - max_winners: number of winners of a giveaway
+# - joins_per_minute: number of times users can join giveaways of a guild in a minute
+DEFAULT_GUILD_LIMITS: dict[str, Optional[int]] = {
+    "max_active_giveaways": 25,
+    "max_entries": None,
+    "max_winners": 100,
+    "joins_per_minute": 300,
+}
+# Specific limits for some guilds, by guild ID, replacing the default ones
+# Example: {123456789012345678: {"max_active_giveaways": 100}}
+GUILD_LIMITS_OVERRIDES: dict[int, dict[str, Optional[int]]] = {}
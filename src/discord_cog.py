@@ -1,8 +1,14 @@
-import random
+import asyncio
+import gzip
+import json
+import os
+import re
+from collections import Counter
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Union
 from uuid import uuid4
 
+import aiohttp
 import discord
 from discord.app_commands import (AppCommandError, Choice, Range,
                                   TransformerError)
@@ -13,10 +19,16 @@ import allay
 from allay.core.src.discord.utils.views import ConfirmView
 
 # pylint: disable=relative-beyond-top-level
+from . import config
 from .custom_args import ColorOption, DateOption, DurationOption
 from .custom_participants_verification import verify_participants
-from .types import GiveawayData, GiveawayParticipant, GiveawayToSendData
-from .views import GiveawayView, ParticipantsPaginator
+from .draws import (DRAW_ALGORITHM, draw_winners, hash_entries, new_draw_seed,
+                    pack_entries_snapshot, unpack_entries_snapshot)
+from .request_scheduler import DiscordRequestScheduler, RequestPriority, TokenBucket
+from .storage import GiveawayStorage, SQLiteStorage
+from .types import (GiveawayData, GiveawayDraw, GiveawayMessage, GiveawayOutboxAction,
+                    GiveawayParticipant, GiveawayToSendData)
+from .views import DrawsPaginator, GiveawayView, ParticipantsPaginator
 
 AcceptableChannel = (
     discord.TextChannel, discord.Thread, discord.StageChannel, discord.VoiceChannel
@@ -25,13 +37,33 @@ AcceptableChannelType = Union[
     discord.TextChannel, discord.Thread, discord.StageChannel, discord.VoiceChannel
 ]
 
+ARCHIVES_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "archives")
+
+# number of giveaways loaded at once when rebuilding a guild statistics, and delay between batches
+STATS_REBUILD_BATCH_SIZE = 50
+STATS_REBUILD_BATCH_DELAY = 0.5
+
+# outbox retry policy: delay doubles after each failed attempt, up to 1 hour
+OUTBOX_MAX_ATTEMPTS = 10
+OUTBOX_BASE_RETRY_DELAY = 5
+OUTBOX_MAX_RETRY_DELAY = 3600
+
 
 class GiveawaysCog(commands.Cog):
     "Handle giveaways"
 
-    def __init__(self, bot: allay.Bot):
+    def __init__(self, bot: allay.Bot, storage: Optional[GiveawayStorage]=None):
         self.bot = bot
+        self.storage = storage or SQLiteStorage()
         self.embed_color = 0x9933ff
+        self.requests = DiscordRequestScheduler()
+        # number of active giveaways per guild, loaded on cog load
+        self.active_giveaways_counts: Counter[int] = Counter()
+        self.guild_joins_buckets: dict[int, TokenBucket] = {}
+        # giveaways currently being closed, to avoid closing one twice at the same time
+        self.closing_giveaways: set[str] = set()
+        # giveaways not recomputed yet by a running statistics rebuild, per guild
+        self.stats_rebuild_pending: dict[int, set[str]] = {}
 
         # we have to register @error this way because it does not support "self" argument
         @self.group.error
@@ -39,21 +71,30 @@ class GiveawaysCog(commands.Cog):
             await self.on_giveaway_command_error(interaction, error)
 
     async def cog_load(self):
-        """Start the scheduler on cog load"""
+        """Start the schedulers and the background tasks on cog load"""
+        await self.storage.setup()
+        self.active_giveaways_counts = Counter(
+            gaw["guild_id"] for gaw in await self.storage.get_active_giveaways()
+        )
+        self.requests.start()
         self.schedule_giveaways.start() # pylint: disable=no-member
+        self.dispatch_outbox.start() # pylint: disable=no-member
+        self.apply_retention_policy.start() # pylint: disable=no-member
 
     async def cog_unload(self):
-        """Stop the scheduler on cog unload"""
+        """Stop the schedulers and the background tasks on cog unload"""
         self.schedule_giveaways.stop() # pylint: disable=no-member
+        self.dispatch_outbox.stop() # pylint: disable=no-member
+        self.apply_retention_policy.stop() # pylint: disable=no-member
+        await self.requests.stop()
 
     @tasks.loop(minutes=1)
     async def schedule_giveaways(self):
         "Check for expired giveaways and schedule their closing"
         now = discord.utils.utcnow()
-        for giveaway in await self.db_get_active_giveaways():
-            if giveaway["ends_at"] <= now:
-                logs.info(f"Closing giveaway {giveaway['id']}")
-                await self.close_giveaway(giveaway)
+        for giveaway in await self.storage.get_due_giveaways(now):
+            logs.info(f"Closing giveaway {giveaway['id']}")
+            await self.close_giveaway(giveaway)
 
     @schedule_giveaways.before_loop
     async def on_schedule_giveaways_before(self):
@@ -65,6 +106,54 @@ class GiveawaysCog(commands.Cog):
         "Log errors from the scheduler"
         self.bot.dispatch("error", error)
 
+    @tasks.loop(seconds=5)
+    async def dispatch_outbox(self):
+        "Run the pending Discord actions of closed or rerolled giveaways"
+        now = discord.utils.utcnow()
+        actions = await self.storage.get_due_outbox_actions(now)
+        results = await asyncio.gather(
+            *(self.run_outbox_action(action) for action in actions), return_exceptions=True
+        )
+        for action, result in zip(actions, results):
+            if isinstance(result, Exception):
+                logs.error(f"Giveaways - outbox action {action['id']} crashed: {result}")
+        if actions:
+            logs.info(f"Giveaways - Discord requests: {self.requests.metrics()}")
+
+    @dispatch_outbox.before_loop
+    async def on_dispatch_outbox_before(self):
+        "Wait for the bot to be ready before starting the outbox dispatcher"
+        await self.bot.wait_until_ready()
+
+    @dispatch_outbox.error
+    async def on_dispatch_outbox_error(self, error: BaseException):
+        "Log errors from the outbox dispatcher"
+        self.bot.dispatch("error", error)
+
+    @tasks.loop(hours=1)
+    async def apply_retention_policy(self):
+        "Compact and purge old ended giveaways, according to the plugin config"
+        now = discord.utils.utcnow()
+        limit = config.RETENTION_GIVEAWAYS_PER_RUN
+        if (purge_days := config.PURGE_ENDED_GIVEAWAYS_AFTER_DAYS) is not None:
+            cutoff_date = now - timedelta(days=purge_days)
+            for gaw in await self.storage.get_giveaways_to_purge(cutoff_date, limit):
+                await self.purge_giveaway(gaw)
+        if (compact_days := config.COMPACT_ENDED_GIVEAWAYS_AFTER_DAYS) is not None:
+            cutoff_date = now - timedelta(days=compact_days)
+            for gaw in await self.storage.get_giveaways_to_compact(cutoff_date, limit):
+                await self.compact_giveaway(gaw)
+
+    @apply_retention_policy.before_loop
+    async def on_apply_retention_policy_before(self):
+        "Wait for the bot to be ready before starting the retention task"
+        await self.bot.wait_until_ready()
+
+    @apply_retention_policy.error
+    async def on_apply_retention_policy_error(self, error: BaseException):
+        "Log errors from the retention task"
+        self.bot.dispatch("error", error)
+
 
     @commands.Cog.listener()
     async def on_interaction(self, interaction: discord.Interaction):
@@ -80,8 +169,15 @@ class GiveawaysCog(commands.Cog):
         if len(custom_ids) != 2 or custom_ids[0] != "gaw":
             return # not a giveaway button
         await interaction.response.defer(ephemeral=True)
+        if not self.check_guild_joins_rate_limit(interaction.guild.id):
+            await interaction.followup.send(
+                f"{interaction.user.mention} too many people are joining giveaways in this server "\
+                "right now, please try again in a few seconds!",
+                ephemeral=True
+            )
+            return
         gaw_id = custom_ids[1]
-        gaw = await self.db_get_giveaway(gaw_id)
+        gaw = await self.storage.get_giveaway(gaw_id)
         if gaw is None or gaw["ended"] or gaw["ends_at"] < discord.utils.utcnow():
             return # giveaway not found or ended
         await self.register_new_participant(interaction, gaw)
@@ -105,23 +201,22 @@ class GiveawaysCog(commands.Cog):
     @group.command(name="list")
     async def gw_list(self, interaction: discord.Interaction, *, include_stopped: bool=False):
         "List all the giveaways in the server"
+        if interaction.guild_id is None:
+            return
         await interaction.response.defer()
         text = ""
         now = discord.utils.utcnow()
-        if include_stopped:
-            giveaways = await self.db_get_giveaways()
-        else:
-            giveaways = await self.db_get_active_giveaways()
+        giveaways = await self.storage.get_guild_giveaways(
+            interaction.guild_id, active_only=not include_stopped)
+        giveaways_ids = [gaw["id"] for gaw in giveaways]
+        entries_counts = await self.storage.get_entries_counts(giveaways_ids)
+        compacted_counts = await self.storage.get_compacted_entries_counts(giveaways_ids)
         for gaw in giveaways:
             name = gaw["name"]
             message_url = f"https://discord.com/channels/{gaw['guild_id']}/{gaw['channel_id']}/{gaw['message_id']}"
             text += f"- **[{name}]({message_url})**  -  "
-            if participants := await self.db_get_giveaways_participants(gaw["id"]):
-                participants_count = len(participants)
-                winners_count = sum(1 for p in participants if p["winner"])
-            else:
-                participants_count = 0
-                winners_count = 0
+            participants_count, winners_count = entries_counts.get(gaw["id"], (0, 0))
+            participants_count = compacted_counts.get(gaw["id"], participants_count)
             if max_entries := gaw.get("max_entries"):
                 text += f"{participants_count}/{max_entries} participants - "
             else:
@@ -146,11 +241,14 @@ class GiveawaysCog(commands.Cog):
         await interaction.followup.send(embed=embed)
 
     @group.command(name="create")
+    @discord.app_commands.describe(
+        close_when_full="Whether the giveaway should end as soon as max_entries is reached"
+    )
     async def gw_create(self, interaction: discord.Interaction, *, name: Range[str, 2, 30],
                         description: Range[str, 2, 256], duration: DurationOption,
                         channel: Optional[AcceptableChannelType]=None,
                         color: Optional[ColorOption]=None, max_entries: Optional[int]=None,
-                        winners_count: int=1):
+                        winners_count: int=1, close_when_full: bool=False):
         "Create a giveaway"
         if interaction.guild is None:
             return
@@ -166,6 +264,20 @@ class GiveawaysCog(commands.Cog):
                 "I need the permission to send messages and embed links in this channel!"
             )
             return
+        limits = self.get_guild_limits(interaction.guild.id)
+        if (
+            (max_active_giveaways := limits["max_active_giveaways"]) is not None
+            and self.active_giveaways_counts[interaction.guild.id] >= max_active_giveaways
+        ):
+            await interaction.response.send_message(
+                f"This server can't have more than {max_active_giveaways} active giveaways at once!"
+            )
+            return
+        if max_entries is None:
+            max_entries = limits["max_entries"]
+        if error_message := self.check_giveaway_limits(limits, max_entries, winners_count):
+            await interaction.response.send_message(error_message)
+            return
         await interaction.response.defer()
         ends_date = discord.utils.utcnow() + timedelta(seconds=duration)
         if max_entries is not None and winners_count > max_entries:
@@ -181,12 +293,24 @@ class GiveawaysCog(commands.Cog):
             "winners_count": winners_count,
             "ends_at": ends_date,
             "ended": False,
+            "close_when_full": close_when_full,
         }
-        message = await self.send_gaw(target_channel, data)
-        await self.db_create_giveaway({
+        # reserve the giveaway slot before sending it, so that concurrent commands can't exceed
+        # the guild limit
+        self.active_giveaways_counts[interaction.guild.id] += 1
+        try:
+            message = await self.requests.submit(
+                target_channel.id, RequestPriority.USER_EDIT,
+                lambda: self.send_gaw(target_channel, data)
+            )
+        except BaseException:
+            self.active_giveaways_counts[interaction.guild.id] -= 1
+            raise
+        await self.storage.create_giveaway({
             **data,
             "message_id": message.id,
         })
+        await self.storage.add_guild_stats(interaction.guild.id, {"giveaways_count": 1})
         await interaction.followup.send(f"Giveaway created at {message.jump_url} !")
 
     @group.command(name="delete")
@@ -195,7 +319,7 @@ class GiveawaysCog(commands.Cog):
         if interaction.guild is None:
             return
         await interaction.response.defer()
-        gaw = await self.db_get_giveaway(giveaway)
+        gaw = await self.storage.get_giveaway(giveaway)
         if gaw is None:
             await interaction.followup.send("Giveaway not found!")
             return
@@ -217,7 +341,10 @@ class GiveawaysCog(commands.Cog):
             if not confirm_view.value:
                 await confirm_view.disable(interaction)
                 return
-        await self.db_delete_giveaway(giveaway)
+        await self.remove_giveaway_stats(gaw)
+        await self.storage.delete_giveaway(giveaway)
+        if not gaw["ended"]:
+            self.active_giveaways_counts[gaw["guild_id"]] -= 1
         await interaction.followup.send("Giveaway deleted!")
 
     async def gw_delete_autocomplete(self, interaction: discord.Interaction, current: str):
@@ -226,8 +353,8 @@ class GiveawaysCog(commands.Cog):
             return []
         current = current.lower()
         choices: list[tuple[bool, str, Choice[str]]] = []
-        for gaw in await self.db_get_giveaways():
-            if gaw["guild_id"] == interaction.guild_id and current in gaw["name"].lower():
+        for gaw in await self.storage.get_guild_giveaways(interaction.guild_id):
+            if current in gaw["name"].lower():
                 priority = not gaw["name"].lower().startswith(current)
                 choice = Choice(name=gaw["name"], value=gaw["id"])
                 choices.append((priority, gaw["name"], choice))
@@ -257,6 +384,10 @@ class GiveawaysCog(commands.Cog):
             await interaction.response.send_message(
                 "You must provide at least one argument to edit!")
             return
+        limits = self.get_guild_limits(interaction.guild.id)
+        if error_message := self.check_giveaway_limits(limits, max_entries, winners_count):
+            await interaction.response.send_message(error_message)
+            return
         if utc_end_date is not None and utc_end_date < discord.utils.utcnow():
             utc_now = discord.utils.utcnow().strftime("%d/%m/%Y %H:%M")
             await interaction.response.send_message(
@@ -264,7 +395,7 @@ class GiveawaysCog(commands.Cog):
             )
             return
         await interaction.response.defer()
-        gaw = await self.db_get_giveaway(giveaway)
+        gaw = await self.storage.get_giveaway(giveaway)
         if gaw is None:
             await interaction.followup.send("Giveaway not found!")
             return
@@ -278,26 +409,69 @@ class GiveawaysCog(commands.Cog):
         # edit original data
         gaw = await self._merge_giveaways_data(
             gaw, name, description, utc_end_date, color, max_entries, winners_count)
-        # edit embed
-        message = await self.fetch_gaw_message(gaw)
-        if message is None:
+        # get participants count
+        participants_count = await self.storage.count_entries(gaw["id"])
+        embed = await self.create_active_gaw_embed(gaw, participants_count=participants_count)
+        # edit every message of the giveaway
+        edited_messages = await asyncio.gather(*(
+            self.requests.submit(
+                message_data["channel_id"], RequestPriority.USER_EDIT,
+                lambda message_data=message_data: self.edit_gaw_message(message_data, embed)
+            )
+            for message_data in await self.get_gaw_messages(gaw)
+        ))
+        if not any(edited_messages):
             await interaction.followup.send("Giveaway message not found!")
             return
-        # get participants count
-        participants = await self.db_get_giveaways_participants(gaw["id"])
-        embed = await self.create_active_gaw_embed(gaw, participants_count=len(participants))
-        await message.edit(embed=embed)
         # edit database
-        await self.db_edit_giveaway(giveaway, gaw)
+        await self.storage.edit_giveaway(giveaway, gaw)
         await interaction.followup.send("Giveaway edited!")
 
+    @group.command(name="crosspost")
+    @discord.app_commands.describe(channel="The channel where the giveaway should also be posted")
+    async def gw_crosspost(self, interaction: discord.Interaction, giveaway: str,
+                           channel: AcceptableChannelType):
+        "Post an existing giveaway in another channel, sharing the same participants"
+        if interaction.guild is None:
+            return
+        bot_perms = channel.permissions_for(interaction.guild.me)
+        if not (bot_perms.send_messages and bot_perms.embed_links):
+            await interaction.response.send_message(
+                "I need the permission to send messages and embed links in this channel!"
+            )
+            return
+        await interaction.response.defer()
+        gaw = await self.storage.get_giveaway(giveaway)
+        if gaw is None:
+            await interaction.followup.send("Giveaway not found!")
+            return
+        if gaw["guild_id"] != interaction.guild.id:
+            await interaction.followup.send("You can only crosspost giveaways of your own server!")
+            return
+        if gaw["ended"]:
+            await interaction.followup.send("You can't crosspost an ended giveaway!")
+            return
+        if any(
+            message_data["channel_id"] == channel.id
+            for message_data in await self.get_gaw_messages(gaw)
+        ):
+            await interaction.followup.send("This giveaway is already posted in this channel!")
+            return
+        participants_count = await self.storage.count_entries(gaw["id"])
+        message = await self.requests.submit(
+            channel.id, RequestPriority.USER_EDIT,
+            lambda: self.send_gaw(channel, gaw, participants_count=participants_count)
+        )
+        await self.storage.add_giveaway_message(gaw["id"], channel.id, message.id)
+        await interaction.followup.send(f"Giveaway posted at {message.jump_url} !")
+
     @group.command(name="list-participants")
     async def gw_list_participants(self, interaction: discord.Interaction, giveaway: str):
         "List all participants in a giveaway"
         if interaction.guild is None:
             return
         await interaction.response.defer()
-        gaw = await self.db_get_giveaway(giveaway)
+        gaw = await self.storage.get_giveaway(giveaway)
         if gaw is None:
             await interaction.followup.send("Giveaway not found!")
             return
@@ -305,7 +479,7 @@ class GiveawaysCog(commands.Cog):
             await interaction.followup.send(
                 "You can only list participants of giveaways in your own server!")
             return
-        participants = await self.db_get_giveaways_participants(giveaway)
+        participants = await self.storage.get_participants(giveaway)
         if not participants:
             await interaction.followup.send("No participants!")
             return
@@ -315,29 +489,75 @@ class GiveawaysCog(commands.Cog):
         )
         await view.send_init(interaction)
 
+    @group.command(name="verify-draw")
+    async def gw_verify_draw(self, interaction: discord.Interaction, giveaway: str):
+        "Replay the draws of a giveaway from the audit log, to check their winners"
+        if interaction.guild is None:
+            return
+        await interaction.response.defer()
+        gaw = await self.storage.get_giveaway(giveaway)
+        if gaw is None:
+            await interaction.followup.send("Giveaway not found!")
+            return
+        if gaw["guild_id"] != interaction.guild.id:
+            await interaction.followup.send(
+                "You can only verify draws of giveaways in your own server!")
+            return
+        draws = await self.storage.get_draws(gaw["id"])
+        if not draws:
+            await interaction.followup.send("No draw has been recorded for this giveaway!")
+            return
+        draws_reports = [self._verify_draw(i, draw) for i, draw in enumerate(draws, start=1)]
+        view = DrawsPaginator(self.bot, self.embed_color, interaction.user, gaw, draws_reports)
+        await view.send_init(interaction)
+
+    def _verify_draw(self, index: int, draw: GiveawayDraw) -> str:
+        "Replay a draw from the audit log, and describe the result"
+        eligible_ids = unpack_entries_snapshot(draw["snapshot"])
+        text = f"**Draw {index}** ({draw['kind']}, `{draw['algorithm']}`, seed `{draw['seed']}`)\n"
+        if hash_entries(eligible_ids) != draw["snapshot_hash"]:
+            return text + "- :x: The eligible entries snapshot does not match its hash!\n"
+        try:
+            replayed_winners = draw_winners(
+                draw["seed"], eligible_ids, draw["winners_count"], draw["algorithm"])
+        except ValueError as err:
+            return text + f"- :x: {err}\n"
+        text += f"- {len(eligible_ids)} eligible entries, hash `{draw['snapshot_hash']}`\n"
+        if replayed_winners == draw["winners"]:
+            return text + f"- :white_check_mark: {len(replayed_winners)} winners replayed \
+identically\n"
+        return text + "- :x: The replayed winners differ from the recorded ones!\n"
+
     @gw_list_participants.autocomplete("giveaway")
+    @gw_crosspost.autocomplete("giveaway")
+    @gw_verify_draw.autocomplete("giveaway")
     @gw_delete.autocomplete("giveaway")
     @gw_edit.autocomplete("giveaway")
     async def gw_command_autocomplete(self, interaction: discord.Interaction, current: str):
-        "Autocomplete for the giveaway argument of /giveaway delete, edit, or list-participants"
+        """Autocomplete for the giveaway argument of /giveaway delete, edit, crosspost,
+        list-participants, or verify-draw"""
         if interaction.guild_id is None:
             return []
         current = current.lower()
         choices: list[tuple[bool, str, Choice[str]]] = []
-        for gaw in await self.db_get_giveaways():
-            if gaw["guild_id"] == interaction.guild_id and current in gaw["name"].lower():
+        for gaw in await self.storage.get_guild_giveaways(interaction.guild_id):
+            if current in gaw["name"].lower():
                 priority = not gaw["name"].lower().startswith(current)
                 choice = Choice(name=gaw["name"], value=gaw["id"])
                 choices.append((priority, gaw["name"], choice))
         return [choice for _, _, choice in sorted(choices, key=lambda x: x[0:2])]
 
     @group.command(name="reroll")
-    async def gw_reroll_winners(self, interaction: discord.Interaction, giveaway: str):
-        "Reroll winners of a giveaway"
+    @discord.app_commands.describe(
+        replace="Mentions or IDs of the winners to replace (leave empty to reroll all winners)"
+    )
+    async def gw_reroll_winners(self, interaction: discord.Interaction, giveaway: str,
+                                replace: Optional[str]=None):
+        "Reroll all winners of a giveaway, or only replace some of them"
         if interaction.guild is None:
             return
         await interaction.response.defer(ephemeral=True)
-        gaw = await self.db_get_giveaway(giveaway)
+        gaw = await self.storage.get_giveaway(giveaway)
         if gaw is None:
             await interaction.followup.send("Giveaway not found!")
             return
@@ -348,16 +568,43 @@ class GiveawaysCog(commands.Cog):
         if not gaw["ended"]:
             await interaction.followup.send("You can only reroll winners of ended giveaways!")
             return
-        gaw["ended"] = False
-        await self.close_giveaway(gaw)
-        participants = await self.db_get_giveaways_participants(gaw["id"])
-        winners = [p for p in participants if p["winner"]]
-        if len(winners) == 0:
-            txt = "No winners picked"
-        elif len(winners) == 1:
-            txt = f"1 winner picked: <@{winners[0]}>"
+        current_winners = await self.storage.get_winners(gaw["id"])
+        if replace:
+            requested_ids = {int(user_id) for user_id in re.findall(r"\d{15,20}", replace)}
+            replaced_winners = [user_id for user_id in current_winners if user_id in requested_ids]
+            if not replaced_winners:
+                await interaction.followup.send("None of these users won this giveaway!")
+                return
+        else:
+            replaced_winners = current_winners
+        # also fill the slots left empty by the previous draw, if any
+        missing_count = max(0, gaw["winners_count"] - len(current_winners))
+        draw = await self.pick_replacement_winners(gaw, len(replaced_winners) + missing_count)
+        if draw is None or not (new_winners := draw["winners"]):
+            await interaction.followup.send(
+                "No other participant can win this giveaway, the winners were not changed!")
+            return
+        # never remove a winner without a replacement: when too few participants are left,
+        # only the first winners are replaced and the other ones keep their prize
+        kept_winners = replaced_winners[len(new_winners):]
+        replaced_winners = replaced_winners[:len(new_winners)]
+        await self.storage.replace_winners(gaw["id"], replaced_winners, new_winners)
+        if not self.is_stats_rebuild_pending(gaw):
+            await self.storage.add_guild_stats(
+                gaw["guild_id"], {"winners_count": len(new_winners) - len(replaced_winners)})
+            await self.storage.add_users_stats(gaw["guild_id"], {
+                **{user_id: (0, -1) for user_id in replaced_winners},
+                **{user_id: (0, 1) for user_id in new_winners},
+            })
+        await self.enqueue_gaw_messages_update(gaw, draw, reroll=True)
+        if len(new_winners) == 1:
+            txt = f"1 new winner picked: <@{new_winners[0]}>"
         else:
-            txt = f"{len(winners)} winners picked: {' '.join(f'<@{winner}>' for winner in winners)}"
+            mentions = " ".join(f"<@{winner}>" for winner in new_winners)
+            txt = f"{len(new_winners)} new winners picked: {mentions}"
+        if kept_winners:
+            mentions = " ".join(f"<@{winner}>" for winner in kept_winners)
+            txt += f"\nNot enough participants left to replace {mentions}"
         await interaction.followup.send(
             "Giveaway rerolled!\n" + txt,
             allowed_mentions=discord.AllowedMentions.none()
@@ -370,17 +617,83 @@ class GiveawaysCog(commands.Cog):
             return []
         current = current.lower()
         choices: list[tuple[bool, str, Choice[str]]] = []
-        for gaw in await self.db_get_giveaways():
-            if (
-                gaw["guild_id"] == interaction.guild_id
-                and gaw["ended"]
-                and current in gaw["name"].lower()
-            ):
+        for gaw in await self.storage.get_guild_giveaways(interaction.guild_id):
+            if gaw["ended"] and current in gaw["name"].lower():
                 priority = not gaw["name"].lower().startswith(current)
                 choice = Choice(name=gaw["name"], value=gaw["id"])
                 choices.append((priority, gaw["name"], choice))
         return [choice for _, _, choice in sorted(choices, key=lambda x: x[0:2])]
 
+    @group.command(name="stats")
+    async def gw_stats(self, interaction: discord.Interaction):
+        "Show statistics about the giveaways of the server"
+        if interaction.guild_id is None:
+            return
+        await interaction.response.defer()
+        stats = await self.storage.get_guild_stats(interaction.guild_id)
+        if stats is None or stats["giveaways_count"] == 0:
+            await interaction.followup.send("No giveaways have been run in this server yet!")
+            return
+        average_entries = stats["entries_count"] / stats["giveaways_count"]
+        text = f"**Giveaways run:** {stats['giveaways_count']} \
+({stats['ended_count']} ended)\n"
+        text += f"**Total entries:** {stats['entries_count']} \
+(average of {average_entries:.1f} per giveaway)\n"
+        text += f"**Unique participants:** {stats['participants_count']}\n"
+        text += f"**Winners picked:** {stats['winners_count']}\n"
+        if stats["fill_rate_count"]:
+            average_fill_rate = stats["fill_rate_sum"] / stats["fill_rate_count"]
+            text += f"**Average fill rate:** {average_fill_rate:.0%} \
+(of giveaways with a maximum number of participants)\n"
+        if top_entrants := await self.storage.get_top_entrants(interaction.guild_id, 5):
+            text += "\n**Top entrants:**\n" + "\n".join(
+                f"{i}. <@{user_id}> ({entries_count} entries)"
+                for i, (user_id, entries_count) in enumerate(top_entrants, start=1)
+            )
+        embed = discord.Embed(
+            title="Giveaways statistics",
+            description=text,
+            color=self.embed_color
+        )
+        await interaction.followup.send(
+            embed=embed, allowed_mentions=discord.AllowedMentions.none())
+
+    @group.command(name="stats-rebuild")
+    async def gw_stats_rebuild(self, interaction: discord.Interaction):
+        "Recompute the giveaways statistics of the server from the existing giveaways"
+        if interaction.guild_id is None:
+            return
+        await interaction.response.defer()
+        if not await self.rebuild_guild_stats(interaction.guild_id):
+            await interaction.followup.send(
+                "The giveaways statistics of this server are already being rebuilt!")
+            return
+        await interaction.followup.send("Giveaways statistics rebuilt!")
+
+    def get_guild_limits(self, guild_id: int) -> dict[str, Optional[int]]:
+        "Get the giveaways limits of a guild, from the plugin config"
+        return config.DEFAULT_GUILD_LIMITS | config.GUILD_LIMITS_OVERRIDES.get(guild_id, {})
+
+    def check_giveaway_limits(self, limits: dict[str, Optional[int]], max_entries: Optional[int],
+                              winners_count: Optional[int]) -> Optional[str]:
+        "Check the settings of a giveaway against its guild limits, and return the error if any"
+        if (limit := limits["max_entries"]) is not None and max_entries is not None \
+                and max_entries > limit:
+            return f"Giveaways of this server can't have more than {limit} participants!"
+        if (limit := limits["max_winners"]) is not None and winners_count is not None \
+                and winners_count > limit:
+            return f"Giveaways of this server can't have more than {limit} winners!"
+        return None
+
+    def check_guild_joins_rate_limit(self, guild_id: int) -> bool:
+        "Check if users of a guild can join one more giveaway right now"
+        if (joins_per_minute := self.get_guild_limits(guild_id)["joins_per_minute"]) is None:
+            return True
+        if (bucket := self.guild_joins_buckets.get(guild_id)) is None:
+            bucket = TokenBucket(joins_per_minute, joins_per_minute / 60)
+            self.guild_joins_buckets[guild_id] = bucket
+        return bucket.try_acquire()
+
     async def create_active_gaw_embed(self, data: GiveawayToSendData, participants_count: int=0):
         "Create a Discord embed for an active giveaway"
         ends_in = discord.utils.format_dt(data["ends_at"], "R")
@@ -398,15 +711,44 @@ class GiveawaysCog(commands.Cog):
         embed.set_footer(text="Ends at")
         return embed
 
-    async def send_gaw(self, channel: AcceptableChannelType, data: GiveawayToSendData):
+    async def disable_gaw_messages(self, data: GiveawayData):
+        "Disable the Join button of every message of a giveaway, without fetching them"
+        view = GiveawayView(self.bot, data, "Join the giveaway!", disabled=True)
+        async def disable_message(message_data: GiveawayMessage):
+            channel = self.bot.get_channel(message_data["channel_id"])
+            if not isinstance(channel, AcceptableChannel):
+                return
+            try:
+                await channel.get_partial_message(message_data["message_id"]).edit(view=view)
+            except discord.NotFound:
+                pass
+        await asyncio.gather(*(
+            self.requests.submit(
+                message_data["channel_id"], RequestPriority.CLOSING,
+                lambda message_data=message_data: disable_message(message_data)
+            )
+            for message_data in await self.get_gaw_messages(data)
+        ), return_exceptions=True)
+
+    async def send_gaw(self, channel: AcceptableChannelType, data: GiveawayToSendData,
+                       participants_count: int=0):
         "Send a giveaway message in a given channel"
-        embed = await self.create_active_gaw_embed(data)
+        embed = await self.create_active_gaw_embed(data, participants_count=participants_count)
         view = GiveawayView(self.bot, data, "Join the giveaway!")
         msg = await channel.send(embed=embed, view=view)
         return msg
 
-    async def fetch_gaw_message(self, data: GiveawayData):
-        "Fetch the Discord message for a giveaway"
+    async def get_gaw_messages(self, data: GiveawayData) -> list[GiveawayMessage]:
+        "Get the original message of a giveaway, followed by its copies in other channels"
+        original_message: GiveawayMessage = {
+            "giveaway_id": data["id"],
+            "channel_id": data["channel_id"],
+            "message_id": data["message_id"],
+        }
+        return [original_message] + await self.storage.get_giveaway_messages(data["id"])
+
+    async def fetch_gaw_message(self, data: Union[GiveawayData, GiveawayMessage]):
+        "Fetch one of the Discord messages of a giveaway"
         channel = self.bot.get_channel(data["channel_id"])
         if not isinstance(channel, AcceptableChannel):
             return None
@@ -416,7 +758,15 @@ class GiveawaysCog(commands.Cog):
             return None
         return message
 
-    async def increase_gaw_embed_participants(self, data: GiveawayData,
+    async def edit_gaw_message(self, data: GiveawayMessage, embed: discord.Embed) -> bool:
+        "Replace the embed of a giveaway message, and return False if the message was not found"
+        message = await self.fetch_gaw_message(data)
+        if message is None:
+            return False
+        await message.edit(embed=embed)
+        return True
+
+    async def increase_gaw_embed_participants(self, data: Union[GiveawayData, GiveawayMessage],
                                               participants_count: Optional[int]=None):
         "Fetch the Discord message for a giveaway, parse it and increment the participants count"
         message = await self.fetch_gaw_message(data)
@@ -436,15 +786,14 @@ class GiveawaysCog(commands.Cog):
     async def register_new_participant(self, interaction: discord.Interaction,
                                        giveaway: GiveawayData):
         """Register a new participant to a giveaway (when they click on the Join button)"""
-        if await self.db_check_giveaway_participant(giveaway["id"], interaction.user.id):
+        if await self.storage.check_participant(giveaway["id"], interaction.user.id):
             await interaction.followup.send(
                 f"{interaction.user.mention} you already joined the giveaway!", ephemeral=True)
             return
-        participants = await self.db_get_giveaways_participants(giveaway["id"])
+        participants_count = await self.storage.count_entries(giveaway["id"])
         if (
             (max_entries := giveaway.get("max_entries"))
-            and participants is not None
-            and len(participants) >= max_entries
+            and participants_count >= max_entries
         ):
             await interaction.followup.send(
                 f"{interaction.user.mention} the limit of participants for this giveaway has "\
@@ -452,24 +801,210 @@ class GiveawaysCog(commands.Cog):
                 ephemeral=True
             )
             return
-        await self.db_add_giveaway_participant(giveaway["id"], interaction.user.id)
+        await self.storage.add_participants(giveaway["id"], [interaction.user.id])
+        if not self.is_stats_rebuild_pending(giveaway):
+            await self.storage.add_guild_stats(giveaway["guild_id"], {"entries_count": 1})
+            await self.storage.add_users_stats(
+                giveaway["guild_id"], {interaction.user.id: (1, 0)})
         await interaction.followup.send(
             f"{interaction.user.mention} you joined the giveaway, good luck!", ephemeral=True)
-        participants_count = len(participants) + 1
-        await self.increase_gaw_embed_participants(giveaway, participants_count=participants_count)
+        if max_entries and giveaway["close_when_full"] and participants_count + 1 >= max_entries:
+            # stop Discord from sending us more clicks, then end the giveaway right now
+            await self.disable_gaw_messages(giveaway)
+            giveaway["ends_at"] = discord.utils.utcnow()
+            await self.storage.edit_giveaway(giveaway["id"], giveaway)
+            await self.close_giveaway(giveaway)
+            return
+        # refreshes of the same message are merged, so the count is read when actually sent
+        for message_data in await self.get_gaw_messages(giveaway):
+            self.requests.schedule(
+                message_data["channel_id"], RequestPriority.COUNT_REFRESH,
+                lambda message_data=message_data: self.refresh_gaw_embed_participants(message_data),
+                merge_key=("participants", message_data["message_id"])
+            )
+
+    async def refresh_gaw_embed_participants(self, data: GiveawayMessage):
+        "Update the participants count displayed in a giveaway message"
+        participants_count = await self.storage.count_entries(data["giveaway_id"])
+        await self.increase_gaw_embed_participants(data, participants_count=participants_count)
 
     async def close_giveaway(self, data: GiveawayData):
-        "Close a giveaway and pick the winners"
-        if data["ended"]:
+        """Close a giveaway and pick the winners
+        The draw is committed to the database first, and the Discord messages are then
+        updated by the outbox dispatcher"""
+        if data["id"] in self.closing_giveaways:
             return
+        self.closing_giveaways.add(data["id"])
+        try:
+            # the given data may have been loaded before another closing of the same giveaway
+            current_data = await self.storage.get_giveaway(data["id"])
+            if current_data is None or current_data["ended"]:
+                return
+            await self._close_giveaway(current_data)
+        finally:
+            self.closing_giveaways.discard(data["id"])
+
+    async def _close_giveaway(self, data: GiveawayData):
         logs.info(f"Closing giveaway {data['id']}")
-        message = await self.fetch_gaw_message(data)
+        # an interrupted previous attempt may have already stored the draw: never re-roll it
+        draws = await self.storage.get_draws(data["id"])
+        closing_draw = next((draw for draw in draws if draw["kind"] == "close"), None)
+        if closing_draw is None:
+            closing_draw = await self.pick_giveaway_winners(data)
+        winners = closing_draw["winners"]
+        await self.storage.set_winners(data["id"], winners)
+        await self.enqueue_gaw_messages_update(data, closing_draw, reroll=False)
+        # mark the giveaway as ended in the database, and only update the counters once
+        if not await self.storage.close_giveaway(data["id"]):
+            return
+        self.active_giveaways_counts[data["guild_id"]] -= 1
+        if self.is_stats_rebuild_pending(data):
+            return
+        entries_count = await self.storage.count_entries(data["id"])
+        await self.storage.add_guild_stats(
+            data["guild_id"], self._get_ended_gaw_stats(data, entries_count, len(winners)))
+        await self.storage.add_users_stats(
+            data["guild_id"], {user_id: (0, 1) for user_id in winners})
+
+    async def enqueue_gaw_messages_update(self, data: GiveawayData, draw: GiveawayDraw,
+                                          reroll: bool):
+        """Add the Discord actions needed after a draw to the outbox, for every giveaway message
+        Enqueuing the same closing twice is a no-op, so this can safely be retried, while
+        each reroll gets its own actions as done actions are kept in the outbox"""
+        now = discord.utils.utcnow()
+        announce_key = f"reroll:{uuid4().hex}" if reroll else "close"
+        for message_data in await self.get_gaw_messages(data):
+            key_prefix = f"{data['id']}:{message_data['message_id']}"
+            message_payload = {
+                "channel_id": message_data["channel_id"],
+                "message_id": message_data["message_id"],
+            }
+            await self.storage.enqueue_outbox_action(
+                f"{key_prefix}:edit:{draw['seed']}", data["id"], "edit",
+                {"message": message_payload}, now
+            )
+            await self.storage.enqueue_outbox_action(
+                f"{key_prefix}:{announce_key}", data["id"], "announce",
+                {
+                    "message": message_payload, "winners": draw["winners"], "reroll": reroll,
+                    "seed": draw["seed"], "snapshot_hash": draw["snapshot_hash"],
+                }, now
+            )
+
+    async def run_outbox_action(self, action: GiveawayOutboxAction):
+        """Run a pending outbox action, and schedule a retry if it failed
+        Unexpected errors are retried as well, so that a single broken action is given up
+        after a few attempts instead of blocking the outbox"""
+        gaw = await self.storage.get_giveaway(action["giveaway_id"])
+        try:
+            if gaw is None:
+                pass # giveaway was deleted in the meantime
+            elif action["action"] == "edit":
+                message_data = action["payload"].get("message", gaw)
+                await self.requests.submit(
+                    message_data["channel_id"], RequestPriority.CLOSING,
+                    lambda: self.edit_ended_gaw_message(gaw, message_data)
+                )
+            elif action["action"] == "announce":
+                message_data = action["payload"].get("message", gaw)
+                await self.requests.submit(
+                    message_data["channel_id"], RequestPriority.CLOSING,
+                    lambda: self.announce_gaw_winners(
+                        gaw, message_data, action["payload"]["winners"],
+                        action["payload"]["reroll"], action["payload"].get("seed"),
+                        action["payload"].get("snapshot_hash"))
+                )
+            else:
+                logs.error(f"Unknown outbox action {action['action']} ({action['id']})")
+        except (discord.NotFound, discord.Forbidden) as err:
+            logs.info(f"Giveaways - dropping outbox action {action['id']}: {err}")
+        except Exception as err: # pylint: disable=broad-exception-caught
+            attempts = action["attempts"] + 1
+            if attempts >= OUTBOX_MAX_ATTEMPTS:
+                logs.error(f"Giveaways - giving up outbox action {action['id']} after \
+{attempts} attempts: {err}")
+            else:
+                if not isinstance(
+                        err, (discord.HTTPException, aiohttp.ClientError, asyncio.TimeoutError)):
+                    logs.error(f"Giveaways - unexpected error in outbox action {action['id']}: \
+{err}")
+                delay = min(OUTBOX_BASE_RETRY_DELAY * 2 ** (attempts - 1), OUTBOX_MAX_RETRY_DELAY)
+                logs.info(f"Giveaways - outbox action {action['id']} failed, retrying \
+in {delay}s: {err}")
+                next_attempt_at = discord.utils.utcnow() + timedelta(seconds=delay)
+                await self.storage.postpone_outbox_action(action["id"], attempts, next_attempt_at)
+                return
+        # done actions are kept, so that they can't be enqueued and sent again
+        await self.storage.complete_outbox_action(action["id"], discord.utils.utcnow())
+
+    async def edit_ended_gaw_message(self, data: GiveawayData,
+                                     message_data: Union[GiveawayData, GiveawayMessage]):
+        """Update a message of an ended giveaway to display its final participants count and its
+        current winners"""
+        message = await self.fetch_gaw_message(message_data)
         if message is None:
             return
-        # edit initial embed
+        if not message.embeds:
+            return
+        winners = await self.storage.get_winners(data["id"])
+        # entries of compacted giveaways are deleted, but their count is kept
+        compacted_counts = await self.storage.get_compacted_entries_counts([data["id"]])
+        if (participants_count := compacted_counts.get(data["id"])) is None:
+            participants_count = await self.storage.count_entries(data["id"])
         embed = message.embeds[0]
+        embed.timestamp = data["ends_at"]
         embed.set_footer(text="Ended at")
-        winners = await self.pick_giveaway_winners(data)
+        self._set_participants_field(embed, data, participants_count)
+        self._set_winners_field(embed, winners)
+        await message.edit(embed=embed, view=None)
+
+    async def announce_gaw_winners(self, data: GiveawayData,
+                                   message_data: Union[GiveawayData, GiveawayMessage],
+                                   winners: list[int], reroll: bool, seed: Optional[str]=None,
+                                   snapshot_hash: Optional[str]=None):
+        """Reply to a giveaway message to mention its winners
+        The draw seed and participants hash are published with them, so that the draw can later
+        be checked against values which were not only stored in the database"""
+        message = await self.fetch_gaw_message(message_data)
+        if message is None:
+            return
+        if reroll:
+            if len(winners) == 0:
+                return
+            if len(winners) == 1:
+                text = f"A new winner has been picked for the **{data['name']}** giveaways!\n"\
+                    f"Congratulations to <@{winners[0]}>!"
+            else:
+                winners_mentions = " ".join(f"<@{winner}>" for winner in winners)
+                text = f"New winners have been picked for the **{data['name']}** giveaways!\n"\
+                    f"Congratulations to {winners_mentions}!"
+        elif len(winners) == 1:
+            text = f"The winner of the **{data['name']}** giveaways has been picked!\n"\
+                f"Congratulations to <@{winners[0]}>!"
+        elif len(winners) != 0:
+            winners_mentions = " ".join(f"<@{winner}>" for winner in winners)
+            text = f"The winners of the **{data['name']}** giveaways have been picked!\n"\
+                f"Congratulations to {winners_mentions}!"
+        else:
+            text = f"Unfortunately, no one joined the **{data['name']}** giveaways...\n"\
+                "Better luck next time!"
+        if seed is not None and snapshot_hash is not None:
+            text += f"\n-# Draw seed: `{seed}` - participants hash: `{snapshot_hash}`"
+        await message.reply(text)
+
+    def _set_participants_field(self, embed: discord.Embed, data: GiveawayData,
+                                participants_count: int):
+        "Replace the participants count of a giveaway embed"
+        if not embed.fields or embed.fields[0].name != "Participants":
+            return
+        if max_entries := data["max_entries"]:
+            value = f"{participants_count}/{max_entries}"
+        else:
+            value = str(participants_count)
+        embed.set_field_at(0, name="Participants", value=value)
+
+    def _set_winners_field(self, embed: discord.Embed, winners: list[int]):
+        "Replace the winners field of a giveaway embed"
         # remove existing winners field
         while embed.fields and embed.fields[-1].name == "Winners":
             embed.remove_field(-1)
@@ -480,37 +1015,176 @@ class GiveawaysCog(commands.Cog):
             embed.add_field(name="Winners", value=", ".join(f"<@{winner}>" for winner in winners))
         else:
             embed.add_field(name="Winners", value=f"{len(winners)} winners picked")
-        await message.edit(embed=embed, view=None)
-        # send a new message mentionning winners
-        if len(winners) == 1:
-            await message.reply(
-                f"The winner of the **{data['name']}** giveaways has been picked!\n"\
-                f"Congratulations to <@{winners[0]}>!",
-            )
-        elif len(winners) != 0:
-            winners_mentions = " ".join(f"<@{winner}>" for winner in winners)
-            await message.reply(
-                f"The winners of the **{data['name']}** giveaways have been picked!\n"\
-                f"Congratulations to {winners_mentions}!",
-            )
-        else:
-            await message.reply(
-                f"Unfortunately, no one joined the **{data['name']}** giveaways...\n"\
-                "Better luck next time!",
-            )
-        # mark the giveaway as ended in the database
-        await self.db_close_giveaway(data["id"], winners)
 
-    async def pick_giveaway_winners(self, data: GiveawayData) -> list[int]:
+    async def compact_giveaway(self, data: GiveawayData):
+        """Only keep the winners and the number of entries of an ended giveaway,
+        optionally archiving its full entries list first"""
+        logs.info(f"Giveaways - compacting giveaway {data['id']}")
+        participants = await self.storage.get_participants(data["id"])
+        # the entries count is only saved once, in case a previous compaction was interrupted
+        if await self.storage.start_compaction(data["id"], len(participants)):
+            await self.remove_compacted_users_stats(data, participants)
+        if config.ARCHIVE_COMPACTED_ENTRIES:
+            await asyncio.to_thread(self._archive_giveaway_entries, data["id"], participants)
+        non_winners_count = sum(1 for participant in participants if not participant["winner"])
+        for _ in range(0, non_winners_count, config.RETENTION_BATCH_SIZE):
+            await self.storage.delete_entries_batch(
+                data["id"], config.RETENTION_BATCH_SIZE, only_non_winners=True)
+            await asyncio.sleep(config.RETENTION_BATCH_DELAY)
+        await self.storage.end_compaction(data["id"], discord.utils.utcnow())
+
+    async def remove_compacted_users_stats(self, data: GiveawayData,
+                                           participants: list[GiveawayParticipant]):
+        """Remove the entries of the non-winners of a giveaway from its users statistics,
+        before they are deleted by its compaction"""
+        if self.is_stats_rebuild_pending(data):
+            return # the rebuild will only count the winners of the compacted giveaway
+        await self.storage.add_users_stats(data["guild_id"], {
+            participant["user_id"]: (-1, 0)
+            for participant in participants
+            if not participant["winner"]
+        })
+
+    def _archive_giveaway_entries(self, giveaway_id: str, participants: list[GiveawayParticipant]):
+        "Save the entries of a giveaway in a compressed JSON file, if not already archived"
+        destination_file = os.path.join(ARCHIVES_DIRECTORY, f"{giveaway_id}.json.gz")
+        if os.path.isfile(destination_file):
+            return
+        os.makedirs(ARCHIVES_DIRECTORY, exist_ok=True)
+        temporary_file = destination_file + ".tmp"
+        with gzip.open(temporary_file, "wt", encoding="utf8") as archive:
+            json.dump(participants, archive, default=str)
+        os.replace(temporary_file, destination_file)
+
+    async def purge_giveaway(self, data: GiveawayData):
+        "Delete an ended giveaway and its entries, a few entries at a time"
+        logs.info(f"Giveaways - purging giveaway {data['id']}")
+        entries_count = await self.storage.count_entries(data["id"])
+        for _ in range(0, entries_count, config.RETENTION_BATCH_SIZE):
+            await self.storage.delete_entries_batch(data["id"], config.RETENTION_BATCH_SIZE)
+            await asyncio.sleep(config.RETENTION_BATCH_DELAY)
+        # the giveaway itself is deleted last, so an interrupted purge is resumed on next run
+        await self.storage.delete_giveaway(data["id"])
+
+    def _get_ended_gaw_stats(self, data: GiveawayData, entries_count: int,
+                             winners_count: int) -> dict[str, float]:
+        "Get the guild statistics increments for an ended giveaway"
+        deltas: dict[str, float] = {"ended_count": 1, "winners_count": winners_count}
+        if max_entries := data["max_entries"]:
+            deltas["fill_rate_sum"] = min(entries_count / max_entries, 1)
+            deltas["fill_rate_count"] = 1
+        return deltas
+
+    async def _get_giveaway_stats(self, data: GiveawayData
+                                  ) -> tuple[dict[str, float], dict[int, tuple[int, int]]]:
+        """Get the guild and users statistics increments of a giveaway, from its current entries
+        Entries of the non-winners of a compacted giveaway are only counted in the guild totals,
+        even while its compaction is still running"""
+        participants = await self.storage.get_participants(data["id"])
+        compacted_counts = await self.storage.get_compacted_entries_counts([data["id"]])
+        entries_count = compacted_counts.get(data["id"], len(participants))
+        guild_deltas: dict[str, float] = {"giveaways_count": 1, "entries_count": entries_count}
+        if data["ended"]:
+            winners_count = sum(1 for participant in participants if participant["winner"])
+            guild_deltas |= self._get_ended_gaw_stats(data, entries_count, winners_count)
+        users_deltas = {
+            participant["user_id"]: (1, int(bool(participant["winner"])))
+            for participant in participants
+            if participant["winner"] or data["id"] not in compacted_counts
+        }
+        return guild_deltas, users_deltas
+
+    def is_stats_rebuild_pending(self, data: GiveawayData) -> bool:
+        """Check if a giveaway is waiting to be recomputed by a statistics rebuild of its guild,
+        in which case its statistics must not be updated until then"""
+        return data["id"] in self.stats_rebuild_pending.get(data["guild_id"], ())
+
+    async def remove_giveaway_stats(self, data: GiveawayData):
+        "Remove a giveaway from its guild statistics, before deleting it"
+        if self.is_stats_rebuild_pending(data):
+            # not counted yet: just make sure the running rebuild won't count it
+            self.stats_rebuild_pending[data["guild_id"]].discard(data["id"])
+            return
+        guild_deltas, users_deltas = await self._get_giveaway_stats(data)
+        await self.storage.add_guild_stats(
+            data["guild_id"], {counter: -delta for counter, delta in guild_deltas.items()})
+        await self.storage.add_users_stats(data["guild_id"], {
+            user_id: (-entries_delta, -wins_delta)
+            for user_id, (entries_delta, wins_delta) in users_deltas.items()
+        })
+
+    async def rebuild_guild_stats(self, guild_id: int) -> bool:
+        """Recompute the statistics of a guild from its giveaways, a few giveaways at a time
+        Returns False if the statistics of this guild are already being rebuilt"""
+        if guild_id in self.stats_rebuild_pending:
+            return False
+        logs.info(f"Giveaways - rebuilding statistics of guild {guild_id}")
+        giveaways_ids = [gaw["id"] for gaw in await self.storage.get_guild_giveaways(guild_id)]
+        # joins and closings of the giveaways which are not recomputed yet are skipped, as they
+        # will be read from the database when recomputing them
+        pending_giveaways = set(giveaways_ids)
+        self.stats_rebuild_pending[guild_id] = pending_giveaways
+        try:
+            await self.storage.reset_guild_stats(guild_id)
+            for i in range(0, len(giveaways_ids), STATS_REBUILD_BATCH_SIZE):
+                for giveaway_id in giveaways_ids[i:i + STATS_REBUILD_BATCH_SIZE]:
+                    if giveaway_id not in pending_giveaways:
+                        continue # deleted in the meantime
+                    pending_giveaways.discard(giveaway_id)
+                    if (gaw := await self.storage.get_giveaway(giveaway_id)) is None:
+                        continue # purged in the meantime
+                    guild_deltas, users_deltas = await self._get_giveaway_stats(gaw)
+                    await self.storage.add_guild_stats(guild_id, guild_deltas)
+                    await self.storage.add_users_stats(guild_id, users_deltas)
+                await asyncio.sleep(STATS_REBUILD_BATCH_DELAY)
+        finally:
+            del self.stats_rebuild_pending[guild_id]
+        return True
+
+    async def pick_giveaway_winners(self, data: GiveawayData) -> GiveawayDraw:
         "Fetch participants of a giveaway and randomly pick winners"
-        participants = await self.db_get_giveaways_participants(data["id"])
+        participants = await self.storage.get_participants(data["id"])
+        if participants:
+            filtered_participants_ids = await verify_participants(self.bot, data, participants)
+        else:
+            filtered_participants_ids = []
+        logs.info(f"Giveaways - {len(filtered_participants_ids)}/{len(participants)} \
+participants are elligible")
+        return await self.run_audited_draw(
+            data, "close", filtered_participants_ids, data["winners_count"])
+
+    async def pick_replacement_winners(self, data: GiveawayData,
+                                       count: int) -> Optional[GiveawayDraw]:
+        """Randomly pick up to `count` new winners among the participants who did not win yet
+        Returns None if there is no one left to pick from"""
+        if count <= 0:
+            return None
+        participants = await self.storage.get_non_winners(data["id"])
         if not participants:
-            return []
+            return None
         filtered_participants_ids = await verify_participants(self.bot, data, participants)
-        winners_count = min(data["winners_count"], len(filtered_participants_ids))
         logs.info(f"Giveaways - {len(filtered_participants_ids)}/{len(participants)} \
-participants are elligible")
-        return random.sample(filtered_participants_ids, winners_count)
+remaining participants are elligible")
+        return await self.run_audited_draw(data, "reroll", filtered_participants_ids, count)
+
+    async def run_audited_draw(self, data: GiveawayData, kind: str, eligible_ids: list[int],
+                               winners_count: int) -> GiveawayDraw:
+        """Pick winners with a new seed, and save everything needed to replay the draw
+        in the audit log"""
+        sorted_ids = sorted(set(eligible_ids))
+        seed = new_draw_seed()
+        draw: GiveawayDraw = {
+            "giveaway_id": data["id"],
+            "kind": kind,
+            "algorithm": DRAW_ALGORITHM,
+            "seed": seed,
+            "winners_count": winners_count,
+            "snapshot_hash": hash_entries(sorted_ids),
+            "snapshot": pack_entries_snapshot(sorted_ids),
+            "winners": draw_winners(seed, sorted_ids, winners_count),
+        }
+        await self.storage.add_draw(draw)
+        return draw
 
     async def _merge_giveaways_data(self, original_data: GiveawayData,
                                     name: Optional[str], description: Optional[str],
@@ -532,114 +1206,3 @@ participants are elligible")
         if winners_count is not None:
             original_data["winners_count"] = winners_count
         return original_data
-
-    async def db_create_giveaway(self, giveaway: GiveawayData):
-        "Add a new giveaway to the database"
-        logs.info(f"Creating giveaway {giveaway['id']}")
-        allay.Database.query(
-            "INSERT INTO `giveaways` VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            (
-                giveaway["id"], giveaway["guild_id"], giveaway["channel_id"],
-                giveaway["message_id"], giveaway["name"], giveaway["description"],
-                giveaway["color"], giveaway["max_entries"], giveaway["winners_count"],
-                giveaway["ends_at"], giveaway["ended"]
-            )
-        )
-
-    async def db_get_giveaways(self) -> list[GiveawayData]:
-        """Get a list of all giveaways in the database"""
-        result = allay.Database.query("SELECT * FROM `giveaways`", astuple=False)
-        for row in result: # pylint: disable=not-an-iterable
-            row["ends_at"] = datetime.fromisoformat(row["ends_at"])
-        return result # type: ignore
-
-    async def db_get_active_giveaways(self) -> list[GiveawayData]:
-        """Get a list of active giveaways (ie. not 'ended')
-        Note: this may include giveaways that have a past end date but have not been marked
-            as ended yet"""
-        result = allay.Database.query("SELECT * FROM `giveaways` WHERE ended = 0", astuple=False)
-        for row in result: # pylint: disable=not-an-iterable
-            row["ends_at"] = datetime.fromisoformat(row["ends_at"])
-        return result # type: ignore
-
-    async def db_get_giveaway(self, giveaway_id: str) -> Optional[GiveawayData]:
-        """Get a giveaway from the database"""
-        result = allay.Database.query(
-            "SELECT * FROM `giveaways` WHERE id = ?",
-            (giveaway_id,),
-            fetchone=True,
-            astuple=False
-        )
-        # pylint: disable=unsubscriptable-object,unsupported-assignment-operation
-        result["ends_at"] = datetime.fromisoformat(result["ends_at"])
-        return result # type: ignore
-
-    async def db_get_giveaways_participants(self, giveaway_id: str) -> list[GiveawayParticipant]:
-        """Get a list of participants for a giveaway"""
-        result = allay.Database.query(
-            "SELECT * FROM `giveaway_entries` WHERE giveaway_id = ?",
-            (giveaway_id,),
-            astuple=False
-        )
-        return result # type: ignore
-
-    async def db_check_giveaway_participant(self, giveaway_id: str, user_id: int) -> bool:
-        """Check if a user is already participating in a giveaway"""
-        result = allay.Database.query(
-            "SELECT EXISTS \
-            (SELECT 1 FROM `giveaway_entries` WHERE giveaway_id = ? AND user_id = ?)",
-            (giveaway_id, user_id),
-            astuple=True,
-            fetchone=True
-        )
-        return bool(result[0]) # pylint: disable=unsubscriptable-object
-
-    async def db_add_giveaway_participant(self, giveaway_id: str, user_id: int):
-        """Add a participant to a giveaway"""
-        logs.info(f"Adding participant {user_id} to giveaway {giveaway_id}")
-        allay.Database.query(
-            "INSERT INTO `giveaway_entries` (`giveaway_id`, `user_id`) VALUES (?, ?)",
-            (giveaway_id, user_id)
-        )
-
-    async def db_edit_giveaway(self, giveaway_id: str, data: GiveawayData):
-        "Edit a giveaway in the database"
-        logs.info(f"Editing giveaway {giveaway_id}")
-        allay.Database.query(
-            "UPDATE `giveaways` SET name = ?, description = ?, color = ?, \
-                max_entries = ?, winners_count = ?, ends_at = ? WHERE id = ?",
-            (
-                data["name"], data["description"], data["color"],
-                data["max_entries"], data["winners_count"], data["ends_at"],
-                giveaway_id
-            )
-        )
-
-    async def db_close_giveaway(self, giveaway_id: str, winners: list[int]):
-        "Mark a giveaway as ended and register the winners"
-        logs.info(f"Closing giveaway {giveaway_id}")
-        # mark giveaway as closed
-        allay.Database.query(
-            "UPDATE `giveaways` SET ended = 1 WHERE id = ?",
-            (giveaway_id,)
-        )
-        # mark winner participants as winners, others and non-winners
-        query_users_list = ', '.join('?' for _ in winners)
-        allay.Database.query(
-            f"UPDATE `giveaway_entries` \
-            SET winner = CASE WHEN user_id IN ({query_users_list}) THEN 1 ELSE 0 END \
-            WHERE giveaway_id = ?",
-            (*winners, giveaway_id)
-        )
-
-    async def db_delete_giveaway(self, giveaway_id: str):
-        "Permanently delete a giveaway from the database"
-        logs.info(f"Deleting giveaway {giveaway_id}")
-        allay.Database.query(
-            "DELETE FROM `giveaways` WHERE id = ?",
-            (giveaway_id,)
-        )
-        allay.Database.query(
-            "DELETE FROM `giveaway_entries` WHERE giveaway_id = ?",
-            (giveaway_id,)
-        )
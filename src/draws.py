@@ -0,0 +1,38 @@
+import hashlib
+import random
+import secrets
+import struct
+import zlib
+
+# version of the winners selection algorithm, stored with each draw so that old draws can
+# still be replayed if the algorithm ever changes
+DRAW_ALGORITHM = "sorted-sample-v1"
+
+
+def new_draw_seed() -> str:
+    "Generate a random seed for a new draw"
+    return secrets.token_hex(16)
+
+def pack_entries_snapshot(user_ids: list[int]) -> bytes:
+    "Serialize a sorted list of user IDs into a compressed snapshot"
+    return zlib.compress(struct.pack(f"<{len(user_ids)}Q", *user_ids))
+
+def unpack_entries_snapshot(snapshot: bytes) -> list[int]:
+    "Deserialize a snapshot created by `pack_entries_snapshot`"
+    data = zlib.decompress(snapshot)
+    return list(struct.unpack(f"<{len(data) // 8}Q", data))
+
+def hash_entries(user_ids: list[int]) -> str:
+    "Get the SHA-256 hash of a sorted list of user IDs"
+    return hashlib.sha256(struct.pack(f"<{len(user_ids)}Q", *user_ids)).hexdigest()
+
+def draw_winners(seed: str, eligible_ids: list[int], winners_count: int,
+                 algorithm: str=DRAW_ALGORITHM) -> list[int]:
+    """Pick winners among eligible users, using a PRNG dedicated to this draw
+    The same seed and eligible users always give the same winners, in the same order"""
+    if algorithm != DRAW_ALGORITHM:
+        raise ValueError(f"Unknown draw algorithm: {algorithm}")
+    # entries are sorted so that the result does not depend on the database order
+    sorted_ids = sorted(set(eligible_ids))
+    rng = random.Random(seed)
+    return rng.sample(sorted_ids, min(winners_count, len(sorted_ids)))
@@ -0,0 +1,238 @@
+import asyncio
+import heapq
+import itertools
+import time
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from LRFutils import logs
+
+RequestFactory = Callable[[], Awaitable[Any]]
+
+
+class RequestPriority(IntEnum):
+    "Priority classes of the Discord requests, lower values are sent first"
+    CLOSING = 0
+    USER_EDIT = 1
+    COUNT_REFRESH = 2
+
+
+class TokenBucket:
+    "Simple token bucket, refilled continuously up to its capacity"
+
+    def __init__(self, capacity: float, refill_rate: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def has_token(self) -> bool:
+        "Check if at least one token is available"
+        self._refill()
+        return self.tokens >= 1
+
+    def try_acquire(self) -> bool:
+        "Consume one token if available"
+        if not self.has_token():
+            return False
+        self.tokens -= 1
+        return True
+
+    def time_until_available(self) -> float:
+        "Number of seconds to wait before a token becomes available"
+        self._refill()
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.refill_rate
+
+
+class _Request:
+    "A queued Discord request"
+    __slots__ = ("channel_id", "priority", "factory", "merge_key", "future", "created_at")
+
+    def __init__(self, channel_id: int, priority: RequestPriority, factory: RequestFactory,
+                 merge_key: Optional[Hashable], future: asyncio.Future):
+        self.channel_id = channel_id
+        self.priority = priority
+        self.factory = factory
+        self.merge_key = merge_key
+        self.future = future
+        self.created_at = time.monotonic()
+
+
+class DiscordRequestScheduler:
+    """Send every Discord request of the plugin through per-channel token buckets
+    and a global one, highest priority first
+
+    Count refreshes sharing the same merge key are merged into the latest one, and
+    are shed when too many of them are waiting or when they waited for too long"""
+
+    def __init__(self, *, channel_capacity: float=5, channel_refill_rate: float=1,
+                 global_capacity: float=40, global_refill_rate: float=40,
+                 max_shedable_requests: int=500, max_shedable_wait: float=60):
+        self.channel_capacity = channel_capacity
+        self.channel_refill_rate = channel_refill_rate
+        self.max_shedable_requests = max_shedable_requests
+        self.max_shedable_wait = max_shedable_wait
+        self._global_bucket = TokenBucket(global_capacity, global_refill_rate)
+        self._channel_buckets: dict[int, TokenBucket] = {}
+        self._queue: list[tuple[int, int, _Request]] = []
+        self._pending_merges: dict[Hashable, _Request] = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        self._running_tasks: set[asyncio.Task] = set()
+        self.sent_count = 0
+        self.failed_count = 0
+        self.merged_count = 0
+        self.shed_count = 0
+
+    def start(self):
+        "Start processing the queue"
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        "Stop processing the queue and cancel the waiting requests"
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        for _, _, request in self._queue:
+            request.future.cancel()
+        self._queue.clear()
+        self._pending_merges.clear()
+
+    def submit(self, channel_id: int, priority: RequestPriority, factory: RequestFactory,
+               merge_key: Optional[Hashable]=None) -> asyncio.Future:
+        """Queue a Discord request and return a future resolved with its result
+        If a request with the same merge key is still waiting, it is replaced by this one and
+        both callers get the same future. Shed requests resolve to None."""
+        if merge_key is not None and (pending := self._pending_merges.get(merge_key)):
+            pending.factory = factory
+            self.merged_count += 1
+            return pending.future
+        future = asyncio.get_running_loop().create_future()
+        if priority == RequestPriority.COUNT_REFRESH and \
+                self._shedable_requests_count() >= self.max_shedable_requests:
+            self.shed_count += 1
+            logs.info(f"Giveaways - shedding request for channel {channel_id} (queue full)")
+            future.set_result(None)
+            return future
+        request = _Request(channel_id, priority, factory, merge_key, future)
+        heapq.heappush(self._queue, (priority, next(self._counter), request))
+        if merge_key is not None:
+            self._pending_merges[merge_key] = request
+        self._wakeup.set()
+        return future
+
+    def schedule(self, channel_id: int, priority: RequestPriority, factory: RequestFactory,
+                 merge_key: Optional[Hashable]=None):
+        "Queue a Discord request without waiting for it, and log its potential error"
+        future = self.submit(channel_id, priority, factory, merge_key)
+        future.add_done_callback(self._log_future_error)
+
+    def metrics(self) -> dict[str, Any]:
+        "Get the current queue depth per priority and the scheduler counters"
+        queue_depth = {priority.name: 0 for priority in RequestPriority}
+        for _, _, request in self._queue:
+            queue_depth[request.priority.name] += 1
+        return {
+            "queue_depth": queue_depth,
+            "running": len(self._running_tasks),
+            "sent": self.sent_count,
+            "failed": self.failed_count,
+            "merged": self.merged_count,
+            "shed": self.shed_count,
+        }
+
+    def _shedable_requests_count(self):
+        return sum(
+            1 for _, _, request in self._queue if request.priority == RequestPriority.COUNT_REFRESH
+        )
+
+    def _get_channel_bucket(self, channel_id: int):
+        if (bucket := self._channel_buckets.get(channel_id)) is None:
+            bucket = TokenBucket(self.channel_capacity, self.channel_refill_rate)
+            self._channel_buckets[channel_id] = bucket
+        return bucket
+
+    def _forget(self, request: _Request):
+        if request.merge_key is not None and self._pending_merges.get(request.merge_key) is request:
+            del self._pending_merges[request.merge_key]
+
+    def _pop_ready_request(self) -> Optional[_Request]:
+        "Pop the highest priority request whose channel has some budget left"
+        if not self._global_bucket.has_token():
+            return None
+        now = time.monotonic()
+        skipped: list[tuple[int, int, _Request]] = []
+        ready_request = None
+        while self._queue:
+            item = heapq.heappop(self._queue)
+            request = item[2]
+            if request.priority == RequestPriority.COUNT_REFRESH and \
+                    now - request.created_at > self.max_shedable_wait:
+                self.shed_count += 1
+                logs.info(f"Giveaways - shedding request for channel {request.channel_id} \
+(waited too long)")
+                self._forget(request)
+                request.future.set_result(None)
+                continue
+            if self._get_channel_bucket(request.channel_id).try_acquire():
+                self._global_bucket.try_acquire()
+                ready_request = request
+                break
+            skipped.append(item)
+        for item in skipped:
+            heapq.heappush(self._queue, item)
+        if ready_request is not None:
+            self._forget(ready_request)
+        return ready_request
+
+    def _next_ready_delay(self) -> Optional[float]:
+        "Number of seconds before a queued request may be sent, or None if the queue is empty"
+        if not self._queue:
+            return None
+        channels_delay = min(
+            self._get_channel_bucket(request.channel_id).time_until_available()
+            for _, _, request in self._queue
+        )
+        return max(channels_delay, self._global_bucket.time_until_available(), 0.05)
+
+    async def _run(self):
+        while True:
+            request = self._pop_ready_request()
+            if request is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self._next_ready_delay())
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.create_task(self._execute(request))
+            self._running_tasks.add(task)
+            task.add_done_callback(self._running_tasks.discard)
+
+    async def _execute(self, request: _Request):
+        if request.future.cancelled():
+            return
+        try:
+            result = await request.factory()
+        except Exception as err: # pylint: disable=broad-exception-caught
+            self.failed_count += 1
+            if not request.future.done():
+                request.future.set_exception(err)
+        else:
+            self.sent_count += 1
+            if not request.future.done():
+                request.future.set_result(result)
+
+    @staticmethod
+    def _log_future_error(future: asyncio.Future):
+        if not future.cancelled() and (err := future.exception()) is not None:
+            logs.error(f"Giveaways - Discord request failed: {err}")
@@ -0,0 +1,6 @@
+# pylint: disable=relative-beyond-top-level
+from .base import GiveawayStorage
+from .memory import MemoryStorage
+from .sqlite import SQLiteStorage
+
+__all__ = ["GiveawayStorage", "MemoryStorage", "SQLiteStorage"]
@@ -0,0 +1,203 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Optional
+
+# pylint: disable=relative-beyond-top-level
+from ..types import (GiveawayData, GiveawayDraw, GiveawayMessage, GiveawayOutboxAction,
+                     GiveawayParticipant, GuildGiveawayStats)
+
+# columns of GuildGiveawayStats which can be incremented
+GUILD_STATS_COUNTERS = (
+    "giveaways_count", "ended_count", "entries_count", "winners_count",
+    "fill_rate_sum", "fill_rate_count"
+)
+
+
+class GiveawayStorage(ABC):
+    """Persistence layer of the giveaways plugin
+    Every method working on several rows should run as few queries as possible,
+    so that backends can optimize them independently of the commands code"""
+
+    async def setup(self):
+        "Prepare the storage before its first use, for example by migrating its schema"
+
+    # Giveaways
+
+    @abstractmethod
+    async def create_giveaway(self, giveaway: GiveawayData):
+        "Add a new giveaway"
+
+    @abstractmethod
+    async def get_giveaway(self, giveaway_id: str) -> Optional[GiveawayData]:
+        "Get a giveaway from its ID, or None if it does not exist"
+
+    @abstractmethod
+    async def get_giveaways(self) -> list[GiveawayData]:
+        "Get a list of all giveaways"
+
+    @abstractmethod
+    async def get_guild_giveaways(self, guild_id: int,
+                                  active_only: bool=False) -> list[GiveawayData]:
+        "Get the giveaways of a guild, optionally excluding ended ones"
+
+    @abstractmethod
+    async def get_active_giveaways(self) -> list[GiveawayData]:
+        """Get a list of active giveaways (ie. not 'ended')
+        Note: this may include giveaways that have a past end date but have not been marked
+            as ended yet"""
+
+    @abstractmethod
+    async def get_due_giveaways(self, now: datetime) -> list[GiveawayData]:
+        """Get the active giveaways whose end date is past, which should now be closed
+        Note: this does not reserve them, only `close_giveaway` tells which caller ended them"""
+
+    @abstractmethod
+    async def edit_giveaway(self, giveaway_id: str, data: GiveawayData):
+        "Edit the editable fields of a giveaway"
+
+    @abstractmethod
+    async def close_giveaway(self, giveaway_id: str) -> bool:
+        """Mark a giveaway as ended, atomically
+        Returns False if it was already ended, so that only one caller runs the closing steps"""
+
+    @abstractmethod
+    async def delete_giveaway(self, giveaway_id: str):
+        "Permanently delete a giveaway and everything related to it"
+
+    # Messages
+
+    @abstractmethod
+    async def add_giveaway_message(self, giveaway_id: str, channel_id: int, message_id: int):
+        "Register a copy of a giveaway message posted in another channel"
+
+    @abstractmethod
+    async def get_giveaway_messages(self, giveaway_id: str) -> list[GiveawayMessage]:
+        "Get the copies of a giveaway message, excluding the original one"
+
+    # Entries
+
+    @abstractmethod
+    async def get_participants(self, giveaway_id: str) -> list[GiveawayParticipant]:
+        "Get a list of participants for a giveaway"
+
+    @abstractmethod
+    async def get_non_winners(self, giveaway_id: str) -> list[GiveawayParticipant]:
+        "Get the participants of a giveaway who did not win it"
+
+    @abstractmethod
+    async def get_winners(self, giveaway_id: str) -> list[int]:
+        "Get the IDs of the current winners of a giveaway"
+
+    @abstractmethod
+    async def check_participant(self, giveaway_id: str, user_id: int) -> bool:
+        "Check if a user is already participating in a giveaway"
+
+    @abstractmethod
+    async def add_participants(self, giveaway_id: str, user_ids: list[int]):
+        "Add participants to a giveaway"
+
+    @abstractmethod
+    async def count_entries(self, giveaway_id: str) -> int:
+        "Count the entries of a giveaway"
+
+    @abstractmethod
+    async def get_entries_counts(self, giveaway_ids: list[str]) -> dict[str, tuple[int, int]]:
+        """Get the number of participants and winners of several giveaways
+        Giveaways without any entry are not included in the result"""
+
+    @abstractmethod
+    async def set_winners(self, giveaway_id: str, winners: list[int]):
+        "Mark the given participants as winners, and every other one as non-winner"
+
+    @abstractmethod
+    async def replace_winners(self, giveaway_id: str, old_winners: list[int],
+                              new_winners: list[int]):
+        "Only update the entries of the replaced winners and of the new ones"
+
+    @abstractmethod
+    async def delete_entries_batch(self, giveaway_id: str, batch_size: int,
+                                   only_non_winners: bool=False):
+        "Delete up to `batch_size` entries of a giveaway at once"
+
+    # Draws audit log
+
+    @abstractmethod
+    async def add_draw(self, draw: GiveawayDraw):
+        "Save a giveaway draw in the audit log"
+
+    @abstractmethod
+    async def get_draws(self, giveaway_id: str) -> list[GiveawayDraw]:
+        "Get the draws of a giveaway from the audit log, oldest first"
+
+    # Outbox
+
+    @abstractmethod
+    async def enqueue_outbox_action(self, dedup_key: str, giveaway_id: str, action: str,
+                                    payload: dict[str, Any], next_attempt_at: datetime):
+        """Add an action to the outbox, unless an action with the same key already exists
+        Done actions are kept, so enqueuing an action which already ran is a no-op"""
+
+    @abstractmethod
+    async def get_due_outbox_actions(self, now: datetime,
+                                     limit: int=50) -> list[GiveawayOutboxAction]:
+        "Get the outbox actions which are not done and should be run now, oldest first"
+
+    @abstractmethod
+    async def postpone_outbox_action(self, action_id: int, attempts: int,
+                                     next_attempt_at: datetime):
+        "Schedule a new attempt for a failed outbox action"
+
+    @abstractmethod
+    async def complete_outbox_action(self, action_id: int, now: datetime):
+        "Mark an outbox action as done, whether it succeeded or was given up"
+
+    # Retention
+
+    @abstractmethod
+    async def get_giveaways_to_purge(self, cutoff_date: datetime,
+                                     limit: int) -> list[GiveawayData]:
+        "Get ended giveaways which ended before a given date"
+
+    @abstractmethod
+    async def get_giveaways_to_compact(self, cutoff_date: datetime,
+                                       limit: int) -> list[GiveawayData]:
+        "Get ended giveaways which ended before a given date and are not fully compacted"
+
+    @abstractmethod
+    async def start_compaction(self, giveaway_id: str, entries_count: int) -> bool:
+        """Save the number of entries of a giveaway before compacting it, if not already saved
+        Returns False if the compaction of this giveaway was already started"""
+
+    @abstractmethod
+    async def end_compaction(self, giveaway_id: str, now: datetime):
+        "Mark a giveaway as fully compacted"
+
+    @abstractmethod
+    async def get_compacted_entries_counts(self, giveaway_ids: list[str]) -> dict[str, int]:
+        """Get the number of entries saved before compacting several giveaways
+        Giveaways which were not compacted are not included in the result"""
+
+    # Statistics
+
+    @abstractmethod
+    async def get_guild_stats(self, guild_id: int) -> Optional[GuildGiveawayStats]:
+        "Get the statistics of a guild, or None if it never had any giveaway"
+
+    @abstractmethod
+    async def get_top_entrants(self, guild_id: int, limit: int) -> list[tuple[int, int]]:
+        "Get the (user ID, entries count) of the users who entered the most giveaways of a guild"
+
+    @abstractmethod
+    async def add_guild_stats(self, guild_id: int, deltas: dict[str, float]):
+        "Increment some counters of a guild statistics (see GUILD_STATS_COUNTERS)"
+
+    @abstractmethod
+    async def add_users_stats(self, guild_id: int, deltas: dict[int, tuple[int, int]]):
+        """Increment the (entries count, wins count) of some users of a guild
+        Users are created or removed when they enter their first giveaway or when they
+        have no entry left, and the guild unique participants count is updated accordingly.
+        Users without any entry are never kept, even if they got a win"""
+
+    @abstractmethod
+    async def reset_guild_stats(self, guild_id: int):
+        "Delete every statistics of a guild"
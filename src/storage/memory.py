@@ -0,0 +1,310 @@
+import itertools
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+# pylint: disable=relative-beyond-top-level
+from ..types import (GiveawayData, GiveawayDraw, GiveawayMessage, GiveawayOutboxAction,
+                     GiveawayParticipant, GuildGiveawayStats)
+from .base import GUILD_STATS_COUNTERS, GiveawayStorage
+
+
+class MemoryStorage(GiveawayStorage):
+    """Store giveaways in memory, mostly useful for tests and benchmarks
+    Returned rows are copies, so they can be freely edited by the caller"""
+
+    def __init__(self):
+        self.giveaways: dict[str, GiveawayData] = {}
+        # entries are indexed by giveaway then by user, in insertion order
+        self.entries: dict[str, dict[int, GiveawayParticipant]] = {}
+        self.messages: dict[str, list[GiveawayMessage]] = {}
+        self.draws: dict[str, list[GiveawayDraw]] = {}
+        self.outbox: dict[int, GiveawayOutboxAction] = {}
+        self.compactions: dict[str, dict[str, Any]] = {}
+        self.guild_stats: dict[int, GuildGiveawayStats] = {}
+        # (entries count, wins count) indexed by guild then by user
+        self.users_stats: dict[int, dict[int, tuple[int, int]]] = {}
+        self._outbox_ids = itertools.count(1)
+        self._draws_ids = itertools.count(1)
+
+    # Giveaways
+
+    async def create_giveaway(self, giveaway: GiveawayData):
+        self.giveaways[giveaway["id"]] = giveaway.copy()
+
+    async def get_giveaway(self, giveaway_id: str) -> Optional[GiveawayData]:
+        if (giveaway := self.giveaways.get(giveaway_id)) is None:
+            return None
+        return giveaway.copy()
+
+    async def get_giveaways(self) -> list[GiveawayData]:
+        return [giveaway.copy() for giveaway in self.giveaways.values()]
+
+    async def get_guild_giveaways(self, guild_id: int,
+                                  active_only: bool=False) -> list[GiveawayData]:
+        return [
+            giveaway.copy() for giveaway in self.giveaways.values()
+            if giveaway["guild_id"] == guild_id and not (active_only and giveaway["ended"])
+        ]
+
+    async def get_active_giveaways(self) -> list[GiveawayData]:
+        return [giveaway.copy() for giveaway in self.giveaways.values() if not giveaway["ended"]]
+
+    async def get_due_giveaways(self, now: datetime) -> list[GiveawayData]:
+        return [
+            giveaway.copy() for giveaway in self.giveaways.values()
+            if not giveaway["ended"] and giveaway["ends_at"] <= now
+        ]
+
+    async def edit_giveaway(self, giveaway_id: str, data: GiveawayData):
+        if (giveaway := self.giveaways.get(giveaway_id)) is None:
+            return
+        for key in ("name", "description", "color", "max_entries", "winners_count", "ends_at"):
+            giveaway[key] = data[key]
+
+    async def close_giveaway(self, giveaway_id: str) -> bool:
+        if (giveaway := self.giveaways.get(giveaway_id)) is None or giveaway["ended"]:
+            return False
+        giveaway["ended"] = True
+        return True
+
+    async def delete_giveaway(self, giveaway_id: str):
+        self.giveaways.pop(giveaway_id, None)
+        self.entries.pop(giveaway_id, None)
+        self.messages.pop(giveaway_id, None)
+        self.compactions.pop(giveaway_id, None)
+        self.draws.pop(giveaway_id, None)
+        for action_id, action in list(self.outbox.items()):
+            if action["giveaway_id"] == giveaway_id:
+                del self.outbox[action_id]
+
+    # Messages
+
+    async def add_giveaway_message(self, giveaway_id: str, channel_id: int, message_id: int):
+        self.messages.setdefault(giveaway_id, []).append({
+            "giveaway_id": giveaway_id,
+            "channel_id": channel_id,
+            "message_id": message_id,
+        })
+
+    async def get_giveaway_messages(self, giveaway_id: str) -> list[GiveawayMessage]:
+        return [message.copy() for message in self.messages.get(giveaway_id, [])]
+
+    # Entries
+
+    def _get_entries(self, giveaway_id: str):
+        return self.entries.get(giveaway_id, {})
+
+    async def get_participants(self, giveaway_id: str) -> list[GiveawayParticipant]:
+        return [entry.copy() for entry in self._get_entries(giveaway_id).values()]
+
+    async def get_non_winners(self, giveaway_id: str) -> list[GiveawayParticipant]:
+        return [
+            entry.copy() for entry in self._get_entries(giveaway_id).values()
+            if not entry["winner"]
+        ]
+
+    async def get_winners(self, giveaway_id: str) -> list[int]:
+        return [
+            user_id for user_id, entry in self._get_entries(giveaway_id).items()
+            if entry["winner"]
+        ]
+
+    async def check_participant(self, giveaway_id: str, user_id: int) -> bool:
+        return user_id in self._get_entries(giveaway_id)
+
+    async def add_participants(self, giveaway_id: str, user_ids: list[int]):
+        entries = self.entries.setdefault(giveaway_id, {})
+        now = datetime.now(timezone.utc)
+        for user_id in user_ids:
+            if user_id in entries:
+                raise ValueError(f"User {user_id} already joined giveaway {giveaway_id}")
+            entries[user_id] = {
+                "giveaway_id": giveaway_id, # type: ignore
+                "user_id": user_id,
+                "winner": False,
+                "created_at": now,
+            }
+
+    async def count_entries(self, giveaway_id: str) -> int:
+        return len(self._get_entries(giveaway_id))
+
+    async def get_entries_counts(self, giveaway_ids: list[str]) -> dict[str, tuple[int, int]]:
+        counts: dict[str, tuple[int, int]] = {}
+        for giveaway_id in giveaway_ids:
+            if entries := self._get_entries(giveaway_id):
+                winners_count = sum(1 for entry in entries.values() if entry["winner"])
+                counts[giveaway_id] = (len(entries), winners_count)
+        return counts
+
+    async def set_winners(self, giveaway_id: str, winners: list[int]):
+        winners_set = set(winners)
+        for user_id, entry in self._get_entries(giveaway_id).items():
+            entry["winner"] = user_id in winners_set
+
+    async def replace_winners(self, giveaway_id: str, old_winners: list[int],
+                              new_winners: list[int]):
+        entries = self._get_entries(giveaway_id)
+        for user_ids, winner in ((old_winners, False), (new_winners, True)):
+            for user_id in user_ids:
+                if entry := entries.get(user_id):
+                    entry["winner"] = winner
+
+    async def delete_entries_batch(self, giveaway_id: str, batch_size: int,
+                                   only_non_winners: bool=False):
+        entries = self._get_entries(giveaway_id)
+        deleted_users = [
+            user_id for user_id, entry in entries.items()
+            if not (only_non_winners and entry["winner"])
+        ][:batch_size]
+        for user_id in deleted_users:
+            del entries[user_id]
+
+    # Draws audit log
+
+    async def add_draw(self, draw: GiveawayDraw):
+        self.draws.setdefault(draw["giveaway_id"], []).append({
+            **draw,
+            "id": next(self._draws_ids),
+            "winners": list(draw["winners"]),
+            "created_at": datetime.now(timezone.utc),
+        })
+
+    async def get_draws(self, giveaway_id: str) -> list[GiveawayDraw]:
+        return [
+            {**draw, "winners": list(draw["winners"])} for draw in self.draws.get(giveaway_id, [])
+        ]
+
+    # Outbox
+
+    async def enqueue_outbox_action(self, dedup_key: str, giveaway_id: str, action: str,
+                                    payload: dict[str, Any], next_attempt_at: datetime):
+        if any(pending["dedup_key"] == dedup_key for pending in self.outbox.values()):
+            return
+        action_id = next(self._outbox_ids)
+        self.outbox[action_id] = {
+            "id": action_id,
+            "dedup_key": dedup_key,
+            "giveaway_id": giveaway_id,
+            "action": action,
+            "payload": payload,
+            "attempts": 0,
+            "next_attempt_at": next_attempt_at,
+            "done_at": None,
+            "created_at": datetime.now(timezone.utc),
+        }
+
+    async def get_due_outbox_actions(self, now: datetime,
+                                     limit: int=50) -> list[GiveawayOutboxAction]:
+        due_actions = sorted(
+            (
+                action for action in self.outbox.values()
+                if action["done_at"] is None and action["next_attempt_at"] <= now
+            ),
+            key=lambda action: (action["next_attempt_at"], action["id"])
+        )
+        return [action.copy() for action in due_actions[:limit]]
+
+    async def postpone_outbox_action(self, action_id: int, attempts: int,
+                                     next_attempt_at: datetime):
+        if (action := self.outbox.get(action_id)) is not None:
+            action["attempts"] = attempts
+            action["next_attempt_at"] = next_attempt_at
+
+    async def complete_outbox_action(self, action_id: int, now: datetime):
+        if (action := self.outbox.get(action_id)) is not None:
+            action["done_at"] = now
+
+    # Retention
+
+    async def get_giveaways_to_purge(self, cutoff_date: datetime,
+                                     limit: int) -> list[GiveawayData]:
+        giveaways = sorted(
+            (
+                giveaway for giveaway in self.giveaways.values()
+                if giveaway["ended"] and giveaway["ends_at"] < cutoff_date
+            ),
+            key=lambda giveaway: giveaway["ends_at"]
+        )
+        return [giveaway.copy() for giveaway in giveaways[:limit]]
+
+    async def get_giveaways_to_compact(self, cutoff_date: datetime,
+                                       limit: int) -> list[GiveawayData]:
+        giveaways = sorted(
+            (
+                giveaway for giveaway in self.giveaways.values()
+                if giveaway["ended"] and giveaway["ends_at"] < cutoff_date
+                and self.compactions.get(giveaway["id"], {}).get("compacted_at") is None
+            ),
+            key=lambda giveaway: giveaway["ends_at"]
+        )
+        return [giveaway.copy() for giveaway in giveaways[:limit]]
+
+    async def start_compaction(self, giveaway_id: str, entries_count: int) -> bool:
+        if giveaway_id in self.compactions:
+            return False
+        self.compactions[giveaway_id] = {"entries_count": entries_count, "compacted_at": None}
+        return True
+
+    async def end_compaction(self, giveaway_id: str, now: datetime):
+        if (compaction := self.compactions.get(giveaway_id)) is not None:
+            compaction["compacted_at"] = now
+
+    async def get_compacted_entries_counts(self, giveaway_ids: list[str]) -> dict[str, int]:
+        return {
+            giveaway_id: self.compactions[giveaway_id]["entries_count"]
+            for giveaway_id in giveaway_ids
+            if giveaway_id in self.compactions
+        }
+
+    # Statistics
+
+    async def get_guild_stats(self, guild_id: int) -> Optional[GuildGiveawayStats]:
+        if (stats := self.guild_stats.get(guild_id)) is None:
+            return None
+        return stats.copy()
+
+    async def get_top_entrants(self, guild_id: int, limit: int) -> list[tuple[int, int]]:
+        users_stats = self.users_stats.get(guild_id, {})
+        top_users = sorted(users_stats.items(), key=lambda item: item[1][0], reverse=True)
+        return [(user_id, entries_count) for user_id, (entries_count, _) in top_users[:limit]]
+
+    def _get_guild_stats(self, guild_id: int) -> GuildGiveawayStats:
+        if (stats := self.guild_stats.get(guild_id)) is None:
+            stats = {
+                "guild_id": guild_id,
+                "giveaways_count": 0,
+                "ended_count": 0,
+                "entries_count": 0,
+                "participants_count": 0,
+                "winners_count": 0,
+                "fill_rate_sum": 0,
+                "fill_rate_count": 0,
+            }
+            self.guild_stats[guild_id] = stats
+        return stats
+
+    async def add_guild_stats(self, guild_id: int, deltas: dict[str, float]):
+        if unknown_counters := set(deltas) - set(GUILD_STATS_COUNTERS):
+            raise ValueError(f"Unknown guild stats counters: {unknown_counters}")
+        stats = self._get_guild_stats(guild_id)
+        for counter, delta in deltas.items():
+            stats[counter] += delta # type: ignore
+
+    async def add_users_stats(self, guild_id: int, deltas: dict[int, tuple[int, int]]):
+        if not deltas:
+            return
+        guild_stats = self._get_guild_stats(guild_id)
+        users_stats = self.users_stats.setdefault(guild_id, {})
+        for user_id, (entries_delta, wins_delta) in deltas.items():
+            was_participant = user_id in users_stats
+            entries_count, wins_count = users_stats.get(user_id, (0, 0))
+            if entries_count + entries_delta > 0:
+                users_stats[user_id] = (entries_count + entries_delta, wins_count + wins_delta)
+                guild_stats["participants_count"] += not was_participant
+            elif was_participant:
+                del users_stats[user_id]
+                guild_stats["participants_count"] -= 1
+
+    async def reset_guild_stats(self, guild_id: int):
+        self.guild_stats.pop(guild_id, None)
+        self.users_stats.pop(guild_id, None)
@@ -0,0 +1,473 @@
+import json
+from datetime import datetime
+from typing import Any, Iterator, Optional, TypeVar
+
+from LRFutils import logs
+
+import allay
+
+# pylint: disable=relative-beyond-top-level
+from ..types import (GiveawayData, GiveawayDraw, GiveawayMessage, GiveawayOutboxAction,
+                     GiveawayParticipant, GuildGiveawayStats)
+from .base import GUILD_STATS_COUNTERS, GiveawayStorage
+
+T = TypeVar("T")
+
+# stay below the SQLite limit of variables in a single query
+MAX_QUERY_VARIABLES = 500
+
+
+def _chunks(items: list[T], size: int=MAX_QUERY_VARIABLES) -> Iterator[list[T]]:
+    "Split a list into smaller lists of at most `size` items"
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _parse_giveaway_row(row: dict[str, Any]) -> GiveawayData:
+    "Convert a raw `giveaways` row into a GiveawayData"
+    row["ends_at"] = datetime.fromisoformat(row["ends_at"])
+    row["ended"] = bool(row["ended"])
+    row["close_when_full"] = bool(row["close_when_full"])
+    return row # type: ignore
+
+def _parse_draw_row(row: dict[str, Any]) -> GiveawayDraw:
+    "Convert a raw `giveaway_draws` row into a GiveawayDraw"
+    row["winners"] = json.loads(row["winners"])
+    return row # type: ignore
+
+def _parse_outbox_row(row: dict[str, Any]) -> GiveawayOutboxAction:
+    "Convert a raw `giveaway_outbox` row into a GiveawayOutboxAction"
+    row["payload"] = json.loads(row["payload"])
+    row["next_attempt_at"] = datetime.fromisoformat(row["next_attempt_at"])
+    if row["done_at"] is not None:
+        row["done_at"] = datetime.fromisoformat(row["done_at"])
+    return row # type: ignore
+
+
+class SQLiteStorage(GiveawayStorage):
+    "Store giveaways in the bot SQLite database"
+
+    async def setup(self):
+        # add the columns created after the first release of the plugin to existing databases
+        for table, column, definition in (
+            ("giveaways", "close_when_full", "BOOLEAN NOT NULL DEFAULT false"),
+            ("giveaway_outbox", "done_at", "DATETIME DEFAULT NULL"),
+        ):
+            columns = allay.Database.query(f"PRAGMA table_info(`{table}`)", astuple=False)
+            # pylint: disable=not-an-iterable
+            if column not in {table_column["name"] for table_column in columns}:
+                logs.info(f"Adding the `{column}` column to the `{table}` table")
+                allay.Database.query(f"ALTER TABLE `{table}` ADD COLUMN `{column}` {definition}")
+        # only pending outbox actions are indexed, as done ones are kept until their giveaway is
+        # deleted; created here because it needs the `done_at` column added above
+        allay.Database.query("DROP INDEX IF EXISTS idx_giveaway_outbox_due")
+        allay.Database.query(
+            "CREATE INDEX IF NOT EXISTS idx_giveaway_outbox_pending \
+            ON `giveaway_outbox` (`next_attempt_at`) WHERE done_at IS NULL"
+        )
+
+    # Giveaways
+
+    async def create_giveaway(self, giveaway: GiveawayData):
+        logs.info(f"Creating giveaway {giveaway['id']}")
+        allay.Database.query(
+            "INSERT INTO `giveaways` (`id`, `guild_id`, `channel_id`, `message_id`, `name`, \
+            `description`, `color`, `max_entries`, `winners_count`, `ends_at`, `ended`, \
+            `close_when_full`) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                giveaway["id"], giveaway["guild_id"], giveaway["channel_id"],
+                giveaway["message_id"], giveaway["name"], giveaway["description"],
+                giveaway["color"], giveaway["max_entries"], giveaway["winners_count"],
+                giveaway["ends_at"], giveaway["ended"], giveaway["close_when_full"]
+            )
+        )
+
+    async def get_giveaway(self, giveaway_id: str) -> Optional[GiveawayData]:
+        result = allay.Database.query(
+            "SELECT * FROM `giveaways` WHERE id = ?",
+            (giveaway_id,),
+            fetchone=True,
+            astuple=False
+        )
+        if result is None:
+            return None
+        return _parse_giveaway_row(result) # type: ignore
+
+    async def get_giveaways(self) -> list[GiveawayData]:
+        result = allay.Database.query("SELECT * FROM `giveaways`", astuple=False)
+        return [_parse_giveaway_row(row) for row in result] # pylint: disable=not-an-iterable
+
+    async def get_guild_giveaways(self, guild_id: int,
+                                  active_only: bool=False) -> list[GiveawayData]:
+        query = "SELECT * FROM `giveaways` WHERE guild_id = ?"
+        if active_only:
+            query += " AND ended = 0"
+        result = allay.Database.query(query, (guild_id,), astuple=False)
+        return [_parse_giveaway_row(row) for row in result] # pylint: disable=not-an-iterable
+
+    async def get_active_giveaways(self) -> list[GiveawayData]:
+        result = allay.Database.query("SELECT * FROM `giveaways` WHERE ended = 0", astuple=False)
+        return [_parse_giveaway_row(row) for row in result] # pylint: disable=not-an-iterable
+
+    async def get_due_giveaways(self, now: datetime) -> list[GiveawayData]:
+        result = allay.Database.query(
+            "SELECT * FROM `giveaways` WHERE ended = 0 AND ends_at <= ?",
+            (now,),
+            astuple=False
+        )
+        return [_parse_giveaway_row(row) for row in result] # pylint: disable=not-an-iterable
+
+    async def edit_giveaway(self, giveaway_id: str, data: GiveawayData):
+        logs.info(f"Editing giveaway {giveaway_id}")
+        allay.Database.query(
+            "UPDATE `giveaways` SET name = ?, description = ?, color = ?, \
+                max_entries = ?, winners_count = ?, ends_at = ? WHERE id = ?",
+            (
+                data["name"], data["description"], data["color"],
+                data["max_entries"], data["winners_count"], data["ends_at"],
+                giveaway_id
+            )
+        )
+
+    async def close_giveaway(self, giveaway_id: str) -> bool:
+        logs.info(f"Closing giveaway {giveaway_id}")
+        # a single statement is atomic, so only one caller can get the ended row back
+        result = allay.Database.query(
+            "UPDATE `giveaways` SET ended = 1 WHERE id = ? AND ended = 0 RETURNING id",
+            (giveaway_id,),
+            astuple=True
+        )
+        return len(result) > 0
+
+    async def delete_giveaway(self, giveaway_id: str):
+        logs.info(f"Deleting giveaway {giveaway_id}")
+        for table, column in (
+            ("giveaways", "id"),
+            ("giveaway_entries", "giveaway_id"),
+            ("giveaway_messages", "giveaway_id"),
+            ("giveaway_outbox", "giveaway_id"),
+            ("giveaway_compactions", "giveaway_id"),
+            ("giveaway_draws", "giveaway_id"),
+        ):
+            allay.Database.query(
+                f"DELETE FROM `{table}` WHERE {column} = ?",
+                (giveaway_id,)
+            )
+
+    # Messages
+
+    async def add_giveaway_message(self, giveaway_id: str, channel_id: int, message_id: int):
+        logs.info(f"Adding message {message_id} to giveaway {giveaway_id}")
+        allay.Database.query(
+            "INSERT INTO `giveaway_messages` (`giveaway_id`, `channel_id`, `message_id`) \
+            VALUES (?, ?, ?)",
+            (giveaway_id, channel_id, message_id)
+        )
+
+    async def get_giveaway_messages(self, giveaway_id: str) -> list[GiveawayMessage]:
+        result = allay.Database.query(
+            "SELECT * FROM `giveaway_messages` WHERE giveaway_id = ?",
+            (giveaway_id,),
+            astuple=False
+        )
+        return result # type: ignore
+
+    # Entries
+
+    async def get_participants(self, giveaway_id: str) -> list[GiveawayParticipant]:
+        result = allay.Database.query(
+            "SELECT * FROM `giveaway_entries` WHERE giveaway_id = ?",
+            (giveaway_id,),
+            astuple=False
+        )
+        return result # type: ignore
+
+    async def get_non_winners(self, giveaway_id: str) -> list[GiveawayParticipant]:
+        result = allay.Database.query(
+            "SELECT * FROM `giveaway_entries` WHERE giveaway_id = ? AND winner = 0",
+            (giveaway_id,),
+            astuple=False
+        )
+        return result # type: ignore
+
+    async def get_winners(self, giveaway_id: str) -> list[int]:
+        result = allay.Database.query(
+            "SELECT user_id FROM `giveaway_entries` WHERE giveaway_id = ? AND winner = 1",
+            (giveaway_id,),
+            astuple=True
+        )
+        return [row[0] for row in result] # pylint: disable=not-an-iterable
+
+    async def check_participant(self, giveaway_id: str, user_id: int) -> bool:
+        result = allay.Database.query(
+            "SELECT EXISTS \
+            (SELECT 1 FROM `giveaway_entries` WHERE giveaway_id = ? AND user_id = ?)",
+            (giveaway_id, user_id),
+            astuple=True,
+            fetchone=True
+        )
+        return bool(result[0]) # pylint: disable=unsubscriptable-object
+
+    async def add_participants(self, giveaway_id: str, user_ids: list[int]):
+        logs.info(f"Adding {len(user_ids)} participants to giveaway {giveaway_id}")
+        for chunk in _chunks(user_ids, MAX_QUERY_VARIABLES // 2):
+            query_values = ', '.join('(?, ?)' for _ in chunk)
+            allay.Database.query(
+                f"INSERT INTO `giveaway_entries` (`giveaway_id`, `user_id`) VALUES {query_values}",
+                tuple(value for user_id in chunk for value in (giveaway_id, user_id))
+            )
+
+    async def count_entries(self, giveaway_id: str) -> int:
+        result = allay.Database.query(
+            "SELECT COUNT(*) FROM `giveaway_entries` WHERE giveaway_id = ?",
+            (giveaway_id,),
+            astuple=True,
+            fetchone=True
+        )
+        return result[0] # pylint: disable=unsubscriptable-object
+
+    async def get_entries_counts(self, giveaway_ids: list[str]) -> dict[str, tuple[int, int]]:
+        counts: dict[str, tuple[int, int]] = {}
+        for chunk in _chunks(giveaway_ids):
+            query_ids_list = ', '.join('?' for _ in chunk)
+            result = allay.Database.query(
+                f"SELECT giveaway_id, COUNT(*), SUM(winner) FROM `giveaway_entries` \
+                WHERE giveaway_id IN ({query_ids_list}) GROUP BY giveaway_id",
+                tuple(chunk),
+                astuple=True
+            )
+            # pylint: disable=not-an-iterable
+            for giveaway_id, entries_count, winners_count in result:
+                counts[giveaway_id] = (entries_count, winners_count or 0)
+        return counts
+
+    async def set_winners(self, giveaway_id: str, winners: list[int]):
+        query_users_list = ', '.join('?' for _ in winners)
+        allay.Database.query(
+            f"UPDATE `giveaway_entries` \
+            SET winner = CASE WHEN user_id IN ({query_users_list}) THEN 1 ELSE 0 END \
+            WHERE giveaway_id = ?",
+            (*winners, giveaway_id)
+        )
+
+    async def replace_winners(self, giveaway_id: str, old_winners: list[int],
+                              new_winners: list[int]):
+        logs.info(f"Replacing {len(old_winners)} winners of giveaway {giveaway_id}")
+        for user_ids, winner in ((old_winners, 0), (new_winners, 1)):
+            for chunk in _chunks(user_ids):
+                query_users_list = ', '.join('?' for _ in chunk)
+                allay.Database.query(
+                    f"UPDATE `giveaway_entries` SET winner = ? \
+                    WHERE giveaway_id = ? AND user_id IN ({query_users_list})",
+                    (winner, giveaway_id, *chunk)
+                )
+
+    async def delete_entries_batch(self, giveaway_id: str, batch_size: int,
+                                   only_non_winners: bool=False):
+        # a single statement is atomic, so the table is never locked for more than one batch
+        winner_condition = "AND winner = 0" if only_non_winners else ""
+        allay.Database.query(
+            f"DELETE FROM `giveaway_entries` WHERE rowid IN \
+            (SELECT rowid FROM `giveaway_entries` \
+            WHERE giveaway_id = ? {winner_condition} LIMIT ?)",
+            (giveaway_id, batch_size)
+        )
+
+    # Draws audit log
+
+    async def add_draw(self, draw: GiveawayDraw):
+        logs.info(f"Saving {draw['kind']} draw of giveaway {draw['giveaway_id']}")
+        allay.Database.query(
+            "INSERT INTO `giveaway_draws` (`giveaway_id`, `kind`, `algorithm`, `seed`, \
+            `winners_count`, `snapshot_hash`, `snapshot`, `winners`) \
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                draw["giveaway_id"], draw["kind"], draw["algorithm"], draw["seed"],
+                draw["winners_count"], draw["snapshot_hash"], draw["snapshot"],
+                json.dumps(draw["winners"])
+            )
+        )
+
+    async def get_draws(self, giveaway_id: str) -> list[GiveawayDraw]:
+        result = allay.Database.query(
+            "SELECT * FROM `giveaway_draws` WHERE giveaway_id = ? ORDER BY id",
+            (giveaway_id,),
+            astuple=False
+        )
+        return [_parse_draw_row(row) for row in result] # pylint: disable=not-an-iterable
+
+    # Outbox
+
+    async def enqueue_outbox_action(self, dedup_key: str, giveaway_id: str, action: str,
+                                    payload: dict[str, Any], next_attempt_at: datetime):
+        allay.Database.query(
+            "INSERT OR IGNORE INTO `giveaway_outbox` \
+            (`dedup_key`, `giveaway_id`, `action`, `payload`, `next_attempt_at`) \
+            VALUES (?, ?, ?, ?, ?)",
+            (dedup_key, giveaway_id, action, json.dumps(payload), next_attempt_at)
+        )
+
+    async def get_due_outbox_actions(self, now: datetime,
+                                     limit: int=50) -> list[GiveawayOutboxAction]:
+        result = allay.Database.query(
+            "SELECT * FROM `giveaway_outbox` WHERE done_at IS NULL AND next_attempt_at <= ? \
+            ORDER BY next_attempt_at, id LIMIT ?",
+            (now, limit),
+            astuple=False
+        )
+        return [_parse_outbox_row(row) for row in result] # pylint: disable=not-an-iterable
+
+    async def postpone_outbox_action(self, action_id: int, attempts: int,
+                                     next_attempt_at: datetime):
+        allay.Database.query(
+            "UPDATE `giveaway_outbox` SET attempts = ?, next_attempt_at = ? WHERE id = ?",
+            (attempts, next_attempt_at, action_id)
+        )
+
+    async def complete_outbox_action(self, action_id: int, now: datetime):
+        allay.Database.query(
+            "UPDATE `giveaway_outbox` SET done_at = ? WHERE id = ?",
+            (now, action_id)
+        )
+
+    # Retention
+
+    async def get_giveaways_to_purge(self, cutoff_date: datetime,
+                                     limit: int) -> list[GiveawayData]:
+        result = allay.Database.query(
+            "SELECT * FROM `giveaways` WHERE ended = 1 AND ends_at < ? ORDER BY ends_at LIMIT ?",
+            (cutoff_date, limit),
+            astuple=False
+        )
+        return [_parse_giveaway_row(row) for row in result] # pylint: disable=not-an-iterable
+
+    async def get_giveaways_to_compact(self, cutoff_date: datetime,
+                                       limit: int) -> list[GiveawayData]:
+        result = allay.Database.query(
+            "SELECT g.* FROM `giveaways` g \
+            LEFT JOIN `giveaway_compactions` c ON c.giveaway_id = g.id \
+            WHERE g.ended = 1 AND g.ends_at < ? AND c.compacted_at IS NULL \
+            ORDER BY g.ends_at LIMIT ?",
+            (cutoff_date, limit),
+            astuple=False
+        )
+        return [_parse_giveaway_row(row) for row in result] # pylint: disable=not-an-iterable
+
+    async def start_compaction(self, giveaway_id: str, entries_count: int) -> bool:
+        result = allay.Database.query(
+            "INSERT OR IGNORE INTO `giveaway_compactions` (`giveaway_id`, `entries_count`) \
+            VALUES (?, ?) RETURNING giveaway_id",
+            (giveaway_id, entries_count),
+            astuple=True
+        )
+        return len(result) > 0
+
+    async def end_compaction(self, giveaway_id: str, now: datetime):
+        allay.Database.query(
+            "UPDATE `giveaway_compactions` SET compacted_at = ? WHERE giveaway_id = ?",
+            (now, giveaway_id)
+        )
+
+    async def get_compacted_entries_counts(self, giveaway_ids: list[str]) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        for chunk in _chunks(giveaway_ids):
+            query_ids_list = ', '.join('?' for _ in chunk)
+            result = allay.Database.query(
+                f"SELECT giveaway_id, entries_count FROM `giveaway_compactions` \
+                WHERE giveaway_id IN ({query_ids_list})",
+                tuple(chunk),
+                astuple=True
+            )
+            for giveaway_id, entries_count in result: # pylint: disable=not-an-iterable
+                counts[giveaway_id] = entries_count
+        return counts
+
+    # Statistics
+
+    async def get_guild_stats(self, guild_id: int) -> Optional[GuildGiveawayStats]:
+        result = allay.Database.query(
+            "SELECT * FROM `giveaway_guild_stats` WHERE guild_id = ?",
+            (guild_id,),
+            fetchone=True,
+            astuple=False
+        )
+        return result # type: ignore
+
+    async def get_top_entrants(self, guild_id: int, limit: int) -> list[tuple[int, int]]:
+        result = allay.Database.query(
+            "SELECT user_id, entries_count FROM `giveaway_user_stats` WHERE guild_id = ? \
+            ORDER BY entries_count DESC LIMIT ?",
+            (guild_id, limit),
+            astuple=True
+        )
+        return [tuple(row) for row in result] # type: ignore # pylint: disable=not-an-iterable
+
+    def _ensure_guild_stats(self, guild_id: int):
+        allay.Database.query(
+            "INSERT OR IGNORE INTO `giveaway_guild_stats` (`guild_id`) VALUES (?)",
+            (guild_id,)
+        )
+
+    async def add_guild_stats(self, guild_id: int, deltas: dict[str, float]):
+        if unknown_counters := set(deltas) - set(GUILD_STATS_COUNTERS):
+            raise ValueError(f"Unknown guild stats counters: {unknown_counters}")
+        if not deltas:
+            return
+        self._ensure_guild_stats(guild_id)
+        query_updates = ', '.join(f"{counter} = {counter} + ?" for counter in deltas)
+        allay.Database.query(
+            f"UPDATE `giveaway_guild_stats` SET {query_updates} WHERE guild_id = ?",
+            (*deltas.values(), guild_id)
+        )
+
+    async def add_users_stats(self, guild_id: int, deltas: dict[int, tuple[int, int]]):
+        if not deltas:
+            return
+        self._ensure_guild_stats(guild_id)
+        # users sharing the same increments are updated in a single query
+        users_by_delta: dict[tuple[int, int], list[int]] = {}
+        for user_id, delta in deltas.items():
+            users_by_delta.setdefault(delta, []).append(user_id)
+        participants_delta = 0
+        for (entries_delta, wins_delta), user_ids in users_by_delta.items():
+            for chunk in _chunks(user_ids):
+                query_users_list = ', '.join('?' for _ in chunk)
+                count_query = f"SELECT COUNT(*) FROM `giveaway_user_stats` \
+                    WHERE guild_id = ? AND user_id IN ({query_users_list})"
+                result = allay.Database.query(
+                    count_query, (guild_id, *chunk), astuple=True, fetchone=True)
+                participants_delta -= result[0] # pylint: disable=unsubscriptable-object
+                query_values = ', '.join('(?, ?)' for _ in chunk)
+                allay.Database.query(
+                    f"INSERT OR IGNORE INTO `giveaway_user_stats` (`guild_id`, `user_id`) \
+                    VALUES {query_values}",
+                    tuple(value for user_id in chunk for value in (guild_id, user_id))
+                )
+                allay.Database.query(
+                    f"UPDATE `giveaway_user_stats` \
+                    SET entries_count = entries_count + ?, wins_count = wins_count + ? \
+                    WHERE guild_id = ? AND user_id IN ({query_users_list})",
+                    (entries_delta, wins_delta, guild_id, *chunk)
+                )
+                # users without any entry left, or who only got a win, are not participants
+                allay.Database.query(
+                    f"DELETE FROM `giveaway_user_stats` \
+                    WHERE guild_id = ? AND entries_count <= 0 AND user_id IN ({query_users_list})",
+                    (guild_id, *chunk)
+                )
+                result = allay.Database.query(
+                    count_query, (guild_id, *chunk), astuple=True, fetchone=True)
+                participants_delta += result[0] # pylint: disable=unsubscriptable-object
+        if participants_delta:
+            allay.Database.query(
+                "UPDATE `giveaway_guild_stats` SET participants_count = participants_count + ? \
+                WHERE guild_id = ?",
+                (participants_delta, guild_id)
+            )
+
+    async def reset_guild_stats(self, guild_id: int):
+        logs.info(f"Resetting giveaways statistics of guild {guild_id}")
+        for table in ("giveaway_guild_stats", "giveaway_user_stats"):
+            allay.Database.query(
+                f"DELETE FROM `{table}` WHERE guild_id = ?",
+                (guild_id,)
+            )
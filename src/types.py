@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, TypedDict
+from typing import Any, Optional, TypedDict
 
 
 class GiveawayToSendData(TypedDict):
@@ -14,6 +14,7 @@ class GiveawayToSendData(TypedDict):
     winners_count: int
     ends_at: datetime
     ended: bool
+    close_when_full: bool
 
 class GiveawayData(TypedDict):
     "Data for a giveaway instance stored in database"
@@ -28,6 +29,24 @@ class GiveawayData(TypedDict):
     winners_count: int
     ends_at: datetime
     ended: bool
+    close_when_full: bool
+
+class GiveawayDraw(TypedDict):
+    "Audit log entry of a giveaway draw, with everything needed to replay it"
+    giveaway_id: str
+    kind: str
+    algorithm: str
+    seed: str
+    winners_count: int
+    snapshot_hash: str
+    snapshot: bytes
+    winners: list[int]
+
+class GiveawayMessage(TypedDict):
+    "Discord message of a giveaway, which may be posted in several channels"
+    giveaway_id: str
+    channel_id: int
+    message_id: int
 
 class GiveawayParticipant(TypedDict):
     "Data for a giveaway participant stored in database"
@@ -35,3 +54,26 @@ class GiveawayParticipant(TypedDict):
     user_id: int
     winner: bool
     created_at: datetime
+
+class GiveawayOutboxAction(TypedDict):
+    "Discord action of a giveaway, stored in the database outbox until the giveaway is deleted"
+    id: int
+    dedup_key: str
+    giveaway_id: str
+    action: str
+    payload: dict[str, Any]
+    attempts: int
+    next_attempt_at: datetime
+    done_at: Optional[datetime]
+    created_at: datetime
+
+class GuildGiveawayStats(TypedDict):
+    "Statistics of the giveaways of a guild, maintained incrementally in database"
+    guild_id: int
+    giveaways_count: int
+    ended_count: int
+    entries_count: int
+    participants_count: int
+    winners_count: int
+    fill_rate_sum: float
+    fill_rate_count: int
@@ -13,7 +13,8 @@ from .types import GiveawayData, GiveawayToSendData
 class GiveawayView(ui.View):
     "Allows users to join a giveaway"
 
-    def __init__(self, bot: Bot, data: GiveawayToSendData, button_label: str):
+    def __init__(self, bot: Bot, data: GiveawayToSendData, button_label: str,
+                 disabled: bool=False):
         super().__init__(timeout=None)
         self.bot = bot
         self.data = data
@@ -21,7 +22,8 @@ class GiveawayView(ui.View):
         enter_btn = ui.Button(
             label=button_label,
             style=ButtonStyle.green,
-            custom_id=f"gaw-{gaw_id}"
+            custom_id=f"gaw-{gaw_id}",
+            disabled=disabled
         )
         self.add_item(enter_btn)
 
@@ -61,3 +63,33 @@ class ParticipantsPaginator(Paginator):
         )
         embed.set_footer(text=f"Page {page}/{self.page_count}")
         return {"embed": embed}
+
+class DrawsPaginator(Paginator):
+    "Allows users to see the replayed draws of a giveaway"
+    draws_per_page = 10
+
+    def __init__(self, client: Bot, embed_color: int, user: Union[User, Member],
+                 gaw: GiveawayData, draws_reports: list[str]):
+        super().__init__(client, user)
+        self.embed_color = embed_color
+        self.title = f"Draws of {gaw['name']}"
+        self.draws_reports = draws_reports
+        self.page_count = ceil(len(draws_reports) / self.draws_per_page)
+
+    async def get_page_count(self) -> int:
+        "Get total number of available pages"
+        return self.page_count
+
+    async def get_page_content(self, _interaction, page):
+        "Build the page content given the page number and source interaction"
+        lower_index = (page - 1) * self.draws_per_page
+        upper_index = min(page * self.draws_per_page, len(self.draws_reports))
+        embed = Embed(
+            title=self.title,
+            description="".join(self.draws_reports[lower_index:upper_index]),
+            color=self.embed_color
+        )
+        # the database could have been edited as a whole, only the announcements can prove it
+        embed.set_footer(text=f"Page {page}/{self.page_count} - Seeds and hashes should match "
+                         "the ones published in the winners announcements")
+        return {"embed": embed}
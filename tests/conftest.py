@@ -0,0 +1,84 @@
+"""The plugin is normally loaded by an Allay bot: these fixtures replace the few parts of
+the framework it relies on, so that it can be tested on its own"""
+import os
+import sqlite3
+import sys
+import types
+from importlib.machinery import SourceFileLoader
+from importlib.util import module_from_spec, spec_from_loader
+
+import discord
+import pytest
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIRECTORY)
+
+
+class FakeDatabase:
+    "In-memory replacement of `allay.Database`, created from the plugin model"
+    connection: sqlite3.Connection
+
+    @classmethod
+    def reset(cls):
+        "Create a new empty database"
+        cls.connection = sqlite3.connect(":memory:")
+        cls.connection.row_factory = sqlite3.Row
+        with open(os.path.join(ROOT_DIRECTORY, "data", "model.sql"), encoding="utf8") as file:
+            cls.connection.executescript(file.read())
+
+    @classmethod
+    def query(cls, query: str, args: tuple=(), astuple: bool=False, fetchone: bool=False):
+        "Run a query and return its rows, like the bot database"
+        cursor = cls.connection.execute(query, args)
+        rows = cursor.fetchall()
+        cls.connection.commit()
+        result = [tuple(row) if astuple else dict(row) for row in rows]
+        if fetchone:
+            return result[0] if result else None
+        return result
+
+
+class FakePaginator(discord.ui.View):
+    "Replacement of the Allay paginator, which only sends its first page"
+
+    def __init__(self, client: discord.Client, user):
+        super().__init__()
+        self.client = client
+        self.user = user
+
+    async def send_init(self, interaction):
+        "Send the first page"
+        await interaction.followup.send(**await self.get_page_content(interaction, 1))
+
+
+def _install_fake_allay():
+    "Register the `allay` modules imported by the plugin"
+    modules = {
+        name: types.ModuleType(name)
+        for name in ("allay", "allay.core", "allay.core.src", "allay.core.src.discord",
+                     "allay.core.src.discord.utils", "allay.core.src.discord.utils.views")
+    }
+    modules["allay"].Bot = modules["allay.core"].Bot = discord.Client
+    modules["allay"].Database = FakeDatabase
+    modules["allay.core.src.discord.utils.views"].ConfirmView = discord.ui.View
+    modules["allay.core.src.discord.utils.views"].Paginator = FakePaginator
+    sys.modules.update(modules)
+
+def _install_default_participants_verification():
+    "Use the example verification file, which is copied by the plugin on its first load"
+    example_file = os.path.join(
+        ROOT_DIRECTORY, "src", "custom_participants_verification.py.example")
+    loader = SourceFileLoader("src.custom_participants_verification", example_file)
+    module = module_from_spec(spec_from_loader(loader.name, loader))
+    loader.exec_module(module)
+    sys.modules[loader.name] = module
+
+_install_fake_allay()
+_install_default_participants_verification()
+
+
+@pytest.fixture(autouse=True)
+def isolated_environment(tmp_path, monkeypatch):
+    "Keep the log files out of the repository, and give each test an empty database"
+    monkeypatch.chdir(tmp_path)
+    FakeDatabase.reset()
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Optional
+
+from src.discord_cog import GiveawaysCog
+from src.storage import GiveawayStorage, MemoryStorage
+from src.types import GiveawayData
+
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def make_giveaway(giveaway_id: str="gaw", **kwargs) -> GiveawayData:
+    "Create the data of an active giveaway ending in one day"
+    data: GiveawayData = {
+        "id": giveaway_id,
+        "guild_id": 1,
+        "channel_id": 10,
+        "message_id": 100,
+        "name": "Giveaway",
+        "description": "Something to win",
+        "color": 0,
+        "max_entries": None,
+        "winners_count": 1,
+        "ends_at": NOW + timedelta(days=1),
+        "ended": False,
+        "close_when_full": False,
+    }
+    return data | kwargs # type: ignore
+
+
+class FakeBot:
+    "Bot without any Discord connection: every channel is unknown"
+
+    def __init__(self):
+        self.dispatched_events: list[tuple] = []
+
+    def get_channel(self, _channel_id: int):
+        return None
+
+    def dispatch(self, event: str, *args):
+        self.dispatched_events.append((event, *args))
+
+
+class FakeInteraction:
+    "Slash command interaction which records the messages sent back to the user"
+
+    def __init__(self, guild_id: int=1, user_id: int=42):
+        self.guild = SimpleNamespace(id=guild_id)
+        self.guild_id = guild_id
+        self.user = SimpleNamespace(id=user_id, mention=f"<@{user_id}>")
+        self.response = SimpleNamespace(defer=self._defer)
+        self.followup = SimpleNamespace(send=self._send)
+        self.sent_messages: list[str] = []
+
+    async def _defer(self, **_kwargs):
+        pass
+
+    async def _send(self, content: str="", **_kwargs):
+        self.sent_messages.append(content)
+
+
+def make_cog(storage: Optional[GiveawayStorage]=None) -> GiveawaysCog:
+    "Create the giveaways cog on top of an in-memory storage"
+    return GiveawaysCog(FakeBot(), storage or MemoryStorage()) # type: ignore
@@ -0,0 +1,85 @@
+import asyncio
+from datetime import timedelta
+
+import discord
+from helpers import NOW, FakeInteraction, make_cog, make_giveaway
+
+from src.discord_cog import GiveawaysCog
+
+
+async def get_closing_counters(cog: GiveawaysCog):
+    "Get the counters which should only change once per closing"
+    stats = await cog.storage.get_guild_stats(1)
+    announcements = [
+        action for action in cog.storage.outbox.values() # type: ignore
+        if action["action"] == "announce"
+    ]
+    return (
+        cog.active_giveaways_counts[1], stats and stats["ended_count"],
+        stats and stats["winners_count"], len(announcements)
+    )
+
+
+def test_close_giveaway_from_outdated_data():
+    cog = make_cog()
+    async def run():
+        gaw = make_giveaway(ends_at=NOW - timedelta(minutes=1), winners_count=2)
+        await cog.storage.create_giveaway(gaw)
+        await cog.storage.add_participants("gaw", [1, 2, 3])
+        cog.active_giveaways_counts[1] = 1
+        outdated_data = (await cog.storage.get_due_giveaways(NOW))[0]
+        await cog.close_giveaway(gaw)
+        await cog.close_giveaway(outdated_data)
+        return await get_closing_counters(cog)
+    assert asyncio.run(run()) == (0, 1, 2, 1)
+
+def test_close_when_full_then_scheduler():
+    cog = make_cog()
+    async def run():
+        gaw = make_giveaway(max_entries=2, close_when_full=True)
+        await cog.storage.create_giveaway(gaw)
+        await cog.storage.add_participants("gaw", [1])
+        cog.active_giveaways_counts[1] = 1
+        cog.requests.start()
+        try:
+            # the scheduler loads the giveaway, then the last participant joins
+            outdated_data = (await cog.storage.get_active_giveaways())[0]
+            await cog.register_new_participant(FakeInteraction(user_id=2), gaw) # type: ignore
+            await cog.close_giveaway(outdated_data)
+        finally:
+            await cog.requests.stop()
+        return await get_closing_counters(cog)
+    assert asyncio.run(run()) == (0, 1, 1, 1)
+
+
+class FakeMessage:
+    "Giveaway message which keeps its last edited embed"
+
+    def __init__(self, embed: discord.Embed):
+        self.embeds = [embed]
+
+    async def edit(self, embed: discord.Embed, **_kwargs):
+        self.embeds = [embed]
+
+    async def reply(self, _content: str):
+        pass
+
+def test_close_when_full_displays_final_count():
+    cog = make_cog()
+    gaw = make_giveaway(max_entries=2, close_when_full=True)
+    message = FakeMessage(discord.Embed().add_field(name="Participants", value="1/2"))
+    async def fetch_gaw_message(_data):
+        return message
+    cog.fetch_gaw_message = fetch_gaw_message # type: ignore
+    async def run():
+        await cog.storage.create_giveaway(gaw)
+        await cog.storage.add_participants("gaw", [1])
+        cog.requests.start()
+        try:
+            await cog.register_new_participant(FakeInteraction(user_id=2), gaw) # type: ignore
+            await cog.dispatch_outbox.coro(cog) # type: ignore
+        finally:
+            await cog.requests.stop()
+    asyncio.run(run())
+    assert message.embeds[0].fields[0].value == "2/2"
+    assert message.embeds[0].fields[-1].name == "Winners"
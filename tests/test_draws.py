@@ -0,0 +1,88 @@
+import asyncio
+from datetime import timedelta
+
+from helpers import NOW, make_cog, make_giveaway
+
+from src.draws import (DRAW_ALGORITHM, draw_winners, hash_entries, pack_entries_snapshot,
+                       unpack_entries_snapshot)
+from src.views import DrawsPaginator
+
+SEED = "0123456789abcdef0123456789abcdef"
+ENTRIES = [300000000000000000 + i * 7919 for i in range(20)]
+
+
+def test_draw_is_reproducible_bit_for_bit():
+    # these values must never change for a given algorithm version, or old draws can't be
+    # verified anymore
+    assert DRAW_ALGORITHM == "sorted-sample-v1"
+    assert draw_winners(SEED, ENTRIES, 3) == [
+        300000000000102947, 300000000000142542, 300000000000000000
+    ]
+    assert hash_entries(ENTRIES) == \
+        "297d213169c3f3e68e5a491e208460af5082e1829131a9aaa7db01ad63d2921a"
+
+def test_draw_does_not_depend_on_entries_order():
+    shuffled_entries = ENTRIES[::-1] + ENTRIES[:5]
+    assert draw_winners(SEED, shuffled_entries, 3) == draw_winners(SEED, ENTRIES, 3)
+
+def test_snapshot_roundtrip():
+    assert unpack_entries_snapshot(pack_entries_snapshot(ENTRIES)) == ENTRIES
+    assert unpack_entries_snapshot(pack_entries_snapshot([])) == []
+
+
+class FakeMessage:
+    "Giveaway message which records its replies"
+
+    def __init__(self):
+        self.embeds = []
+        self.replies: list[str] = []
+
+    async def reply(self, content: str):
+        self.replies.append(content)
+
+def test_closing_publishes_the_draw():
+    cog = make_cog()
+    message = FakeMessage()
+    async def fetch_gaw_message(_data):
+        return message
+    cog.fetch_gaw_message = fetch_gaw_message # type: ignore
+    async def run():
+        gaw = make_giveaway(ends_at=NOW - timedelta(minutes=1), winners_count=2)
+        await cog.storage.create_giveaway(gaw)
+        await cog.storage.add_participants("gaw", ENTRIES)
+        await cog.close_giveaway(gaw)
+        cog.requests.start()
+        try:
+            await cog.dispatch_outbox.coro(cog) # type: ignore
+        finally:
+            await cog.requests.stop()
+        return await cog.storage.get_draws("gaw"), await cog.storage.get_winners("gaw")
+    draws, winners = asyncio.run(run())
+    assert len(draws) == 1 and sorted(draws[0]["winners"]) == sorted(winners)
+    assert draws[0]["snapshot_hash"] == hash_entries(ENTRIES)
+    assert draw_winners(draws[0]["seed"], ENTRIES, 2) == draws[0]["winners"]
+    assert len(message.replies) == 1
+    assert f"`{draws[0]['seed']}`" in message.replies[0]
+    assert f"`{draws[0]['snapshot_hash']}`" in message.replies[0]
+
+def test_verify_many_draws_fits_in_embeds():
+    cog = make_cog()
+    async def run():
+        gaw = make_giveaway(ends_at=NOW - timedelta(minutes=1))
+        await cog.storage.create_giveaway(gaw)
+        await cog.storage.add_participants("gaw", ENTRIES)
+        for _ in range(25):
+            await cog.run_audited_draw(gaw, "reroll", ENTRIES, 1)
+        draws = await cog.storage.get_draws("gaw")
+        reports = [cog._verify_draw(i, draw) for i, draw in enumerate(draws, start=1)]
+        paginator = DrawsPaginator(cog.bot, 0, None, gaw, reports) # type: ignore
+        pages = [
+            (await paginator.get_page_content(None, page))["embed"]
+            for page in range(1, await paginator.get_page_count() + 1)
+        ]
+        return reports, pages
+    reports, pages = asyncio.run(run())
+    assert all(":white_check_mark:" in report for report in reports)
+    assert len(pages) == 3
+    assert all(len(page.description) <= 4096 for page in pages)
+    assert "".join(page.description for page in pages) == "".join(reports)
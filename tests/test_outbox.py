@@ -0,0 +1,55 @@
+import asyncio
+
+import discord
+from helpers import make_cog, make_giveaway
+
+from src.discord_cog import GiveawaysCog
+
+
+async def run_outbox(cog: GiveawaysCog):
+    "Run the due outbox actions once, through the requests scheduler"
+    cog.requests.start()
+    try:
+        await cog.dispatch_outbox.coro(cog) # type: ignore
+    finally:
+        await cog.requests.stop()
+
+async def get_due_actions(cog: GiveawaysCog):
+    "Get the outbox actions which should run now"
+    return await cog.storage.get_due_outbox_actions(discord.utils.utcnow())
+
+
+def test_delivered_announcement_is_not_enqueued_again():
+    cog = make_cog()
+    async def run():
+        gaw = make_giveaway(ended=True)
+        await cog.storage.create_giveaway(gaw)
+        draw = await cog.run_audited_draw(gaw, "close", [1], 1)
+        await cog.enqueue_gaw_messages_update(gaw, draw, reroll=False)
+        enqueued_actions = await get_due_actions(cog)
+        await run_outbox(cog)
+        # a closing interrupted after the announcement was sent enqueues it again
+        await cog.enqueue_gaw_messages_update(gaw, draw, reroll=False)
+        return enqueued_actions, await get_due_actions(cog)
+    enqueued_actions, due_actions = asyncio.run(run())
+    assert sorted(action["action"] for action in enqueued_actions) == ["announce", "edit"]
+    assert not due_actions
+
+def test_unexpected_error_postpones_action():
+    cog = make_cog()
+    async def broken_edit(*_args):
+        raise IndexError("list index out of range")
+    cog.edit_ended_gaw_message = broken_edit # type: ignore
+    async def run():
+        gaw = make_giveaway(ended=True)
+        await cog.storage.create_giveaway(gaw)
+        draw = await cog.run_audited_draw(gaw, "close", [1], 1)
+        await cog.enqueue_gaw_messages_update(gaw, draw, reroll=False)
+        await run_outbox(cog)
+        return await get_due_actions(cog), list(cog.storage.outbox.values()) # type: ignore
+    due_actions, actions = asyncio.run(run())
+    # the announcement was still sent, and the broken edit will be retried later
+    assert not due_actions
+    attempts = {action["action"]: (action["attempts"], action["done_at"] is not None)
+                for action in actions}
+    assert attempts == {"announce": (0, True), "edit": (1, False)}
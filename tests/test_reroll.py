@@ -0,0 +1,71 @@
+import asyncio
+from typing import Optional
+
+import discord
+
+from helpers import FakeInteraction, make_cog, make_giveaway
+
+from src.discord_cog import GiveawaysCog
+
+# Discord IDs of the test users, the reroll command only parses snowflake-like IDs
+USERS = [200000000000000000 + i for i in range(6)]
+
+
+async def create_ended_giveaway(cog: GiveawaysCog, participants: list[int], winners: list[int]):
+    "Store an ended giveaway with the given participants and winners"
+    await cog.storage.create_giveaway(make_giveaway(winners_count=len(winners), ended=True))
+    await cog.storage.add_participants("gaw", participants)
+    await cog.storage.set_winners("gaw", winners)
+
+async def reroll(cog: GiveawaysCog, replace: Optional[str]=None) -> FakeInteraction:
+    "Run the reroll command on the test giveaway"
+    interaction = FakeInteraction()
+    await cog.gw_reroll_winners.callback(cog, interaction, "gaw", replace) # type: ignore
+    return interaction
+
+
+def test_reroll_replaces_requested_winners():
+    cog = make_cog()
+    async def run():
+        await create_ended_giveaway(cog, USERS, USERS[:2])
+        await reroll(cog, f"<@{USERS[0]}>")
+        return await cog.storage.get_winners("gaw")
+    winners = asyncio.run(run())
+    assert len(winners) == 2 and USERS[1] in winners and USERS[0] not in winners
+
+def test_reroll_without_other_participants_keeps_winners():
+    cog = make_cog()
+    async def run():
+        await create_ended_giveaway(cog, USERS[:2], USERS[:2])
+        interaction = await reroll(cog)
+        actions = await cog.storage.get_due_outbox_actions(make_giveaway()["ends_at"])
+        return sorted(await cog.storage.get_winners("gaw")), actions, interaction.sent_messages
+    winners, actions, messages = asyncio.run(run())
+    assert winners == USERS[:2]
+    assert not actions
+    assert "winners were not changed" in messages[0]
+
+def test_reroll_with_too_few_participants_keeps_some_winners():
+    cog = make_cog()
+    async def run():
+        # only one non-winner left, for example after a compaction
+        await create_ended_giveaway(cog, USERS[:4], USERS[:3])
+        interaction = await reroll(cog)
+        return sorted(await cog.storage.get_winners("gaw")), interaction.sent_messages
+    winners, messages = asyncio.run(run())
+    assert winners == USERS[1:4]
+    assert f"Not enough participants left to replace <@{USERS[1]}> <@{USERS[2]}>" in messages[0]
+
+def test_reroll_after_closing_edits_messages_again():
+    cog = make_cog()
+    async def run():
+        await cog.storage.create_giveaway(make_giveaway(winners_count=1))
+        await cog.storage.add_participants("gaw", USERS)
+        await cog.close_giveaway(make_giveaway())
+        # the closing actions are done, as if they were sent to Discord
+        for action in await cog.storage.get_due_outbox_actions(discord.utils.utcnow()):
+            await cog.storage.complete_outbox_action(action["id"], discord.utils.utcnow())
+        await reroll(cog)
+        return await cog.storage.get_due_outbox_actions(discord.utils.utcnow())
+    due_actions = asyncio.run(run())
+    assert sorted(action["action"] for action in due_actions) == ["announce", "edit"]
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+from helpers import FakeInteraction, make_cog, make_giveaway
+
+from src import config, discord_cog
+from src.discord_cog import GiveawaysCog
+
+
+@pytest.fixture(autouse=True)
+def small_rebuild_batches(monkeypatch):
+    "Rebuild statistics one giveaway at a time, without waiting between them"
+    monkeypatch.setattr(discord_cog, "STATS_REBUILD_BATCH_SIZE", 1)
+    monkeypatch.setattr(discord_cog, "STATS_REBUILD_BATCH_DELAY", 0)
+
+async def create_giveaways(cog: GiveawaysCog):
+    "Store two active giveaways, joined by two users"
+    for giveaway_id in ("first", "second"):
+        await cog.storage.create_giveaway(make_giveaway(giveaway_id))
+        await cog.storage.add_participants(giveaway_id, [1, 2])
+
+async def join(cog: GiveawaysCog, giveaway_id: str, user_id: int):
+    "Join a giveaway as a user"
+    gaw = await cog.storage.get_giveaway(giveaway_id)
+    await cog.register_new_participant(FakeInteraction(user_id=user_id), gaw) # type: ignore
+
+
+def test_rebuild_stats():
+    cog = make_cog()
+    async def run():
+        await create_giveaways(cog)
+        await cog.rebuild_guild_stats(1)
+        return await cog.storage.get_guild_stats(1)
+    stats = asyncio.run(run())
+    assert stats is not None
+    assert (stats["giveaways_count"], stats["entries_count"], stats["participants_count"]) == \
+        (2, 4, 2)
+
+def test_join_during_rebuild_is_counted_once():
+    cog = make_cog()
+    async def run():
+        await create_giveaways(cog)
+        rebuild = asyncio.create_task(cog.rebuild_guild_stats(1))
+        # let the rebuild recompute the first giveaway only
+        await asyncio.sleep(0)
+        concurrent_rebuild = await cog.rebuild_guild_stats(1)
+        await join(cog, "first", 3)
+        await join(cog, "second", 4)
+        await rebuild
+        return concurrent_rebuild, await cog.storage.get_guild_stats(1)
+    concurrent_rebuild, stats = asyncio.run(run())
+    assert concurrent_rebuild is False
+    assert stats is not None
+    assert (stats["giveaways_count"], stats["entries_count"], stats["participants_count"]) == \
+        (2, 6, 4)
+
+def test_delete_during_rebuild():
+    cog = make_cog()
+    async def run():
+        await create_giveaways(cog)
+        rebuild = asyncio.create_task(cog.rebuild_guild_stats(1))
+        await asyncio.sleep(0)
+        gaw = await cog.storage.get_giveaway("second")
+        await cog.remove_giveaway_stats(gaw) # type: ignore
+        await cog.storage.delete_giveaway("second")
+        await rebuild
+        return await cog.storage.get_guild_stats(1)
+    stats = asyncio.run(run())
+    assert stats is not None
+    assert (stats["giveaways_count"], stats["entries_count"]) == (1, 2)
+
+def test_delete_compacted_giveaway(monkeypatch):
+    monkeypatch.setattr(config, "ARCHIVE_COMPACTED_ENTRIES", False)
+    monkeypatch.setattr(config, "RETENTION_BATCH_DELAY", 0)
+    cog = make_cog()
+    async def run():
+        await create_giveaways(cog)
+        await cog.rebuild_guild_stats(1)
+        gaw = await cog.storage.get_giveaway("first")
+        await cog.close_giveaway(gaw) # type: ignore
+        gaw = await cog.storage.get_giveaway("first")
+        await cog.compact_giveaway(gaw) # type: ignore
+        # a compaction resumed after a restart must not remove the statistics twice
+        await cog.compact_giveaway(gaw) # type: ignore
+        compacted_stats = await cog.storage.get_guild_stats(1)
+        await cog.remove_giveaway_stats(gaw) # type: ignore
+        await cog.storage.delete_giveaway("first")
+        gaw = await cog.storage.get_giveaway("second")
+        await cog.remove_giveaway_stats(gaw) # type: ignore
+        await cog.storage.delete_giveaway("second")
+        return compacted_stats, await cog.storage.get_guild_stats(1), \
+            await cog.storage.get_top_entrants(1, 10)
+    compacted_stats, stats, top_entrants = asyncio.run(run())
+    assert compacted_stats is not None and stats is not None
+    assert (compacted_stats["entries_count"], compacted_stats["participants_count"]) == (4, 2)
+    assert (stats["giveaways_count"], stats["entries_count"], stats["participants_count"]) == \
+        (0, 0, 0)
+    assert not top_entrants
@@ -0,0 +1,128 @@
+import asyncio
+from datetime import timedelta
+
+import allay
+import pytest
+from helpers import NOW, make_giveaway
+
+from src.storage import GiveawayStorage, MemoryStorage, SQLiteStorage
+
+
+@pytest.fixture(name="storage", params=["memory", "sqlite"])
+def fixture_storage(request) -> GiveawayStorage:
+    "Run the test with every storage backend"
+    storage = MemoryStorage() if request.param == "memory" else SQLiteStorage()
+    asyncio.run(storage.setup())
+    return storage
+
+
+def test_get_unknown_giveaway(storage: GiveawayStorage):
+    assert asyncio.run(storage.get_giveaway("unknown")) is None
+
+def test_get_due_giveaways(storage: GiveawayStorage):
+    async def run():
+        await storage.create_giveaway(make_giveaway("due", ends_at=NOW - timedelta(minutes=1)))
+        await storage.create_giveaway(make_giveaway("active"))
+        await storage.create_giveaway(
+            make_giveaway("ended", ends_at=NOW - timedelta(days=1), ended=True))
+        return await storage.get_due_giveaways(NOW)
+    assert [giveaway["id"] for giveaway in asyncio.run(run())] == ["due"]
+
+def test_close_giveaway_only_once(storage: GiveawayStorage):
+    async def run():
+        await storage.create_giveaway(make_giveaway())
+        results = [await storage.close_giveaway("gaw"), await storage.close_giveaway("gaw")]
+        giveaway = await storage.get_giveaway("gaw")
+        return results, giveaway
+    results, giveaway = asyncio.run(run())
+    assert results == [True, False]
+    assert giveaway is not None and giveaway["ended"]
+    assert asyncio.run(storage.close_giveaway("unknown")) is False
+
+def test_winners(storage: GiveawayStorage):
+    async def run():
+        await storage.create_giveaway(make_giveaway())
+        await storage.add_participants("gaw", [1, 2, 3, 4])
+        await storage.set_winners("gaw", [1, 2])
+        await storage.replace_winners("gaw", [1], [3])
+        non_winners = [entry["user_id"] for entry in await storage.get_non_winners("gaw")]
+        return (
+            sorted(await storage.get_winners("gaw")), sorted(non_winners),
+            await storage.get_entries_counts(["gaw", "unknown"])
+        )
+    winners, non_winners, counts = asyncio.run(run())
+    assert winners == [2, 3]
+    assert non_winners == [1, 4]
+    assert counts == {"gaw": (4, 2)}
+
+def test_compaction_keeps_winners(storage: GiveawayStorage):
+    async def run():
+        await storage.create_giveaway(make_giveaway())
+        await storage.add_participants("gaw", list(range(1, 11)))
+        await storage.set_winners("gaw", [5])
+        await storage.start_compaction("gaw", 10)
+        await storage.delete_entries_batch("gaw", 4, only_non_winners=True)
+        partial_count = await storage.count_entries("gaw")
+        await storage.delete_entries_batch("gaw", 100, only_non_winners=True)
+        # a resumed compaction must not overwrite the saved entries count
+        await storage.start_compaction("gaw", 1)
+        return (
+            partial_count, await storage.get_winners("gaw"),
+            await storage.get_compacted_entries_counts(["gaw"])
+        )
+    assert asyncio.run(run()) == (6, [5], {"gaw": 10})
+
+def test_delete_giveaway(storage: GiveawayStorage):
+    async def run():
+        await storage.create_giveaway(make_giveaway())
+        await storage.add_participants("gaw", [1, 2])
+        await storage.add_giveaway_message("gaw", 11, 101)
+        await storage.enqueue_outbox_action("gaw:edit", "gaw", "edit", {}, NOW)
+        await storage.delete_giveaway("gaw")
+        return (
+            await storage.get_giveaway("gaw"), await storage.count_entries("gaw"),
+            await storage.get_giveaway_messages("gaw"), await storage.get_due_outbox_actions(NOW)
+        )
+    assert asyncio.run(run()) == (None, 0, [], [])
+
+def test_outbox_deduplication(storage: GiveawayStorage):
+    async def run():
+        await storage.enqueue_outbox_action("gaw:edit", "gaw", "edit", {"a": 1}, NOW)
+        await storage.enqueue_outbox_action("gaw:edit", "gaw", "edit", {"a": 2}, NOW)
+        actions = await storage.get_due_outbox_actions(NOW)
+        await storage.postpone_outbox_action(actions[0]["id"], 1, NOW + timedelta(seconds=5))
+        return actions, await storage.get_due_outbox_actions(NOW)
+    actions, due_actions = asyncio.run(run())
+    assert [action["payload"] for action in actions] == [{"a": 1}]
+    assert not due_actions
+
+def test_users_stats(storage: GiveawayStorage):
+    async def run():
+        await storage.add_users_stats(1, {1: (1, 0), 2: (2, 1), 3: (1, 0)})
+        await storage.add_users_stats(1, {2: (-1, -1), 3: (-1, 0)})
+        # a win of a user whose entry was never counted, eg. for an older giveaway
+        await storage.add_users_stats(1, {4: (0, 1)})
+        return await storage.get_guild_stats(1), await storage.get_top_entrants(1, 10)
+    stats, top_entrants = asyncio.run(run())
+    assert stats is not None and stats["participants_count"] == 2
+    assert sorted(top_entrants) == [(1, 1), (2, 1)]
+
+def test_due_outbox_actions_skip_done_ones(storage: GiveawayStorage):
+    async def run():
+        await storage.enqueue_outbox_action("gaw:announce", "gaw", "announce", {}, NOW)
+        await storage.enqueue_outbox_action(
+            "gaw:edit", "gaw", "edit", {}, NOW - timedelta(seconds=5))
+        await storage.enqueue_outbox_action("gaw:done", "gaw", "edit", {}, NOW)
+        done_action = (await storage.get_due_outbox_actions(NOW))[-1]
+        await storage.complete_outbox_action(done_action["id"], NOW)
+        return await storage.get_due_outbox_actions(NOW)
+    assert [action["dedup_key"] for action in asyncio.run(run())] == ["gaw:edit", "gaw:announce"]
+
+def test_due_outbox_actions_query_uses_pending_index():
+    asyncio.run(SQLiteStorage().setup())
+    plan = allay.Database.query(
+        "EXPLAIN QUERY PLAN SELECT * FROM `giveaway_outbox` WHERE done_at IS NULL \
+        AND next_attempt_at <= ? ORDER BY next_attempt_at, id LIMIT ?",
+        (NOW, 50)
+    )
+    assert "idx_giveaway_outbox_pending" in plan[0]["detail"]